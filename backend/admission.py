@@ -0,0 +1,180 @@
+import asyncio
+import math
+import os
+import time
+import weakref
+from collections import OrderedDict, deque
+
+import anyio
+
+import metrics
+
+# Admission control for LLM-backed chat turns. At most CHAT_MAX_CONCURRENCY
+# turns run at once, on their own thread limiter so they never take
+# Starlette's default threadpool tokens away from /mood, /journal and
+# /history. Further turns wait in a bounded queue that is served round-robin
+# per client, so one busy client can't push everyone else to the back; a turn
+# that can't be queued, or waits longer than CHAT_QUEUE_TIMEOUT_SECS, is
+# rejected and the endpoint either answers 429 or falls back to the local
+# engine (CHAT_OVERLOAD=reject|fallback).
+#
+# All bookkeeping happens on the event loop, so no locks are needed.
+
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "16"))
+CHAT_QUEUE_SIZE = int(os.getenv("CHAT_QUEUE_SIZE", "64"))
+CHAT_QUEUE_PER_CLIENT = int(os.getenv("CHAT_QUEUE_PER_CLIENT", "4"))
+CHAT_QUEUE_TIMEOUT_SECS = float(os.getenv("CHAT_QUEUE_TIMEOUT_SECS", "5"))
+CHAT_OVERLOAD = os.getenv("CHAT_OVERLOAD", "fallback")  # or "reject" (429)
+# Proxies in front of the app that append to X-Forwarded-For. The fairness key
+# is the hop the outermost of them saw; anything further left was written by
+# the client and can't be trusted. 0 ignores the header (peer address only);
+# on Vercel the platform sets the header itself, so one hop is trusted
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1" if os.environ.get("VERCEL") else "0"))
+
+QUEUE_FULL = "queue_full"
+CLIENT_QUEUE_FULL = "client_queue_full"
+TIMEOUT = "timeout"
+
+class Rejected(Exception):
+    """The turn was not admitted; reason is queue_full, client_queue_full or timeout."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class FairLimiter:
+    """Concurrency limit with a bounded wait queue, served round-robin across clients."""
+
+    def __init__(self, limit, max_queue, max_per_client, max_wait):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_per_client = max_per_client
+        self.max_wait = max_wait
+        self.active = 0
+        self.queued = 0
+        self._waiters = OrderedDict()  # client -> deque of futures, in round-robin order
+        self.admitted = 0
+        self.rejected = 0
+
+    def retry_after(self):
+        return max(1, math.ceil(self.max_wait))
+
+    def _reject(self, reason):
+        self.rejected += 1
+        metrics.inc("mhc_chat_rejected_total", help="Chat turns turned away by admission control", reason=reason)
+        raise Rejected(reason, self.retry_after())
+
+    async def acquire(self, client):
+        """Wait for a slot; returns the seconds spent queued or raises Rejected."""
+        start = time.perf_counter()
+        if self.limit <= 0:
+            self.active += 1  # unlimited: only counted, so release() stays balanced
+            return 0.0
+        if self.active < self.limit and not self.queued:
+            self.active += 1
+            return self._admitted(start)
+        if self.queued >= self.max_queue:
+            self._reject(QUEUE_FULL)
+        waiters = self._waiters.get(client)
+        if waiters is not None and len(waiters) >= self.max_per_client:
+            self._reject(CLIENT_QUEUE_FULL)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(client, deque()).append(fut)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done() and not fut.cancelled():
+                # the slot was handed over just as we gave up: pass it on
+                self.release()
+            else:
+                fut.cancel()
+                self._forget(client, fut)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._reject(TIMEOUT)
+        return self._admitted(start)
+
+    def _admitted(self, start):
+        waited = time.perf_counter() - start
+        self.admitted += 1
+        metrics.observe("mhc_chat_queue_wait_seconds", waited, help="Time chat turns waited for an LLM slot")
+        return waited
+
+    def _forget(self, client, fut):
+        waiters = self._waiters.get(client)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(fut)
+            self.queued -= 1
+        except ValueError:
+            pass
+        if not waiters:
+            del self._waiters[client]
+
+    def release(self):
+        """Free a slot, handing it straight to the next client in round-robin order."""
+        while self._waiters:
+            client, waiters = next(iter(self._waiters.items()))
+            fut = waiters.popleft()
+            self.queued -= 1
+            if waiters:
+                self._waiters.move_to_end(client)
+            else:
+                del self._waiters[client]
+            if not fut.done():
+                fut.set_result(None)  # slot changes hands, active stays the same
+                return
+        self.active -= 1
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "limit": self.limit,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "queued_clients": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+class Slot:
+    """A slot held past the handler (streamed replies), given back exactly once."""
+
+    def __init__(self, limiter):
+        self._limiter = limiter
+        self._loop = asyncio.get_running_loop()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self._limiter.release()
+
+    def release_when_dropped(self, owner):
+        # a response body that is never iterated (client gone before the
+        # first chunk, error before streaming) never reaches its finally;
+        # give the slot back when it is garbage collected instead
+        finalizer = weakref.finalize(owner, self._loop.call_soon_threadsafe, self.release)
+        finalizer.atexit = False
+
+limiter = FairLimiter(CHAT_MAX_CONCURRENCY, CHAT_QUEUE_SIZE, CHAT_QUEUE_PER_CLIENT, CHAT_QUEUE_TIMEOUT_SECS)
+# threads for admitted turns, separate from the default threadpool tokens
+threads = anyio.CapacityLimiter(max(CHAT_MAX_CONCURRENCY, 1))
+
+def client_key(request, trusted_hops=None):
+    """Who a request counts against for fair queueing: the X-Forwarded-For hop the outermost trusted proxy added, else the peer address."""
+    trusted_hops = TRUSTED_PROXY_HOPS if trusted_hops is None else trusted_hops
+    forwarded = request.headers.get("x-forwarded-for") if trusted_hops > 0 else None
+    if forwarded:
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        if hops:
+            return hops[-min(trusted_hops, len(hops))]
+    return request.client.host if request.client else "unknown"
+
+async def run_sync(fn, *args):
+    """Run an admitted turn's blocking work on the chat thread limiter."""
+    return await anyio.to_thread.run_sync(lambda: fn(*args), limiter=threads)
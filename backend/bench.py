@@ -0,0 +1,407 @@
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Microbenchmarks for the backend hot paths on synthetic data:
+#   safety    - is_crisis across message lengths
+#   kb        - get_kb_context / get_fallback_response across intent counts
+#   db        - get_history, save_mood, save_journal on generated databases
+#   wellness  - bag-of-words featurization and model prediction
+#
+#   cd backend
+#   python bench.py -o bench.json                  # run and save results
+#   python bench.py --compare bench.json           # run and diff against a saved run
+#   python bench.py --only db --rows 10000,1000000,10000000
+#
+# Results are JSON ({"meta": ..., "results": [...]}, times in seconds per call).
+# With --compare the exit code is 1 when any median got slower than the
+# baseline by more than --threshold, so it can gate a CI job.
+
+BENCH_VERSION = 1
+GROUPS = ("safety", "kb", "db", "wellness")
+SEED = 42
+
+DEFAULT_LENGTHS = (8, 64, 512, 4096)  # words per message
+DEFAULT_INTENT_COUNTS = (50, 500, 5000)
+DEFAULT_ROWS = (10_000, 100_000)  # 1M / 10M via --rows, generated once and reused
+DEFAULT_THRESHOLD = 0.15
+DATA_DIR = os.path.join(tempfile.gettempdir(), "mhc-bench")
+
+SAMPLES = 15
+MIN_SAMPLE_SECS = 0.02  # each sample loops the call until it takes at least this long
+POOL_SIZE = 64  # distinct inputs cycled per benchmark (defeats last-message memos)
+FILL_CHUNK = 100_000
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+
+FILLER = (
+    "today work sleep tired friend family music walk class exam stress happy sad "
+    "talked coffee morning night week weekend feel think maybe really little long "
+    "day time people home school job anxious calm better worse again still"
+).split()
+
+# --- timing ---
+
+def measure(fn, samples=SAMPLES, min_sample_secs=MIN_SAMPLE_SECS):
+    """Seconds per call of fn: calibrate a loop count, then time `samples` loops."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_sample_secs or number >= 1_000_000:
+            break
+        number = min(1_000_000, max(number * 2, int(number * min_sample_secs / max(elapsed, 1e-9))))
+
+    times = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    times.sort()
+    return {
+        "number": number,
+        "samples": samples,
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "min": times[0],
+        "p95": times[min(len(times) - 1, int(0.95 * len(times)))],
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+def result(group, name, params, fn, args):
+    stats = measure(fn, samples=args.samples)
+    row = {"name": name, "group": group, "params": params, **stats, "ops_per_sec": 1 / stats["median"]}
+    print(f"  {name:<48} {stats['median'] * 1e6:>12.2f} us  (p95 {stats['p95'] * 1e6:.2f}, n={stats['number']}x{stats['samples']})")
+    return row
+
+def skipped(group, name, reason):
+    print(f"  {name:<48} skipped: {reason}")
+    return {"name": name, "group": group, "skipped": reason}
+
+def cycle(items):
+    return itertools.cycle(items).__next__
+
+# --- synthetic data ---
+
+def kb_vocab():
+    """Words that occur in the real KB patterns, so messages actually hit the index."""
+    import kb_artifact
+    from intent_index import tokenize
+    words = {w for intent in kb_artifact.load_sources(MODELS_DIR) for p in intent.get("patterns", []) for w in tokenize(p)}
+    return sorted(words) or FILLER
+
+def make_messages(rng, length, vocab, count=POOL_SIZE, keyword=None):
+    """count distinct messages of `length` words; keyword (if any) goes near the end."""
+    messages = []
+    for _ in range(count):
+        words = [rng.choice(vocab) for _ in range(length)]
+        if keyword:
+            words.insert(max(0, length - 3), keyword)
+        messages.append(" ".join(words))
+    return messages
+
+def make_intents(rng, count, vocab, patterns=6, responses=3):
+    return [
+        {
+            "tag": f"synthetic_{i}",
+            "patterns": [" ".join(rng.choice(vocab) for _ in range(rng.randint(2, 6))) for _ in range(patterns)],
+            "responses": [f"Synthetic response {i}.{r}" for r in range(responses)],
+        }
+        for i in range(count)
+    ]
+
+def synthetic_rows(rng, count, start_id=0, span_days=5 * 365):
+    """(kind, row) tuples in timestamp order, half moods and half journals."""
+    start = datetime.datetime(2020, 1, 1)
+    step = span_days * 86400 / max(count, 1)
+    for i in range(start_id, start_id + count):
+        ts = (start + datetime.timedelta(seconds=i * step)).isoformat()
+        if i % 2:
+            yield "journal", (" ".join(rng.choice(FILLER) for _ in range(rng.randint(10, 60))), ts)
+        else:
+            yield "mood", (rng.randint(1, 5), rng.choice(("", "ok", "long day", "slept well")), ts)
+
+def synthetic_db(rows, seed, data_dir):
+    """Path of a DB with `rows` moods+journals; built once per (rows, seed) and reused."""
+    import database
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"history_{rows}_{seed}.db")
+    done = path + ".ok"
+    if os.path.exists(path) and os.path.exists(done):
+        return path
+
+    for suffix in ("", "-wal", "-shm", ".ok"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    print(f"  generating {rows:,} rows into {path} ...")
+    database.DB_NAME = path
+    database.close_all()
+    database.init_db()
+    conn = database.get_connection()
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    for offset in range(0, rows, FILL_CHUNK):
+        moods, journals = [], []
+        for kind, row in synthetic_rows(rng, min(FILL_CHUNK, rows - offset), start_id=offset):
+            (moods if kind == "mood" else journals).append(row)
+        with conn:
+            conn.executemany(database.INSERT_MOOD_SQL, moods)
+            conn.executemany(database.INSERT_JOURNAL_SQL, journals)
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    database.close_all()
+    open(done, "w").close()
+    print(f"  generated in {time.perf_counter() - started:.1f}s")
+    return path
+
+# --- benchmark groups ---
+
+def bench_safety(args, rng):
+    import safety
+    # time the matcher behind is_crisis() directly, so a memo in front of
+    # it can never turn the timings into cache hits
+    matcher = safety.CrisisMatcher(safety.CRISIS_KEYWORDS)
+    out = []
+    for length in args.lengths:
+        benign = make_messages(rng, length, FILLER)
+        crisis = make_messages(rng, length, FILLER, keyword="kill myself")
+        nxt = cycle(benign)
+        out.append(result("safety", f"safety.is_crisis[len={length}]", {"words": length, "crisis": False},
+                          lambda: bool(matcher.find(nxt())), args))
+        nxt_c = cycle(crisis)
+        out.append(result("safety", f"safety.is_crisis[len={length},crisis]", {"words": length, "crisis": True},
+                          lambda: bool(matcher.find(nxt_c())), args))
+    return out
+
+def bench_kb(args, rng):
+    import chat_engine
+    import kb_artifact
+    from intent_index import IntentIndex
+    vocab = kb_vocab()
+    messages = make_messages(rng, 12, vocab)
+    cases = [("kb", kb_artifact.load_sources(MODELS_DIR))]
+    cases += [(str(n), make_intents(rng, n, vocab)) for n in args.intents]
+
+    out = []
+    saved = (chat_engine.intents, chat_engine.intent_index, chat_engine._kb_loaded)
+    try:
+        for label, intents in cases:
+            chat_engine.intents = intents
+            chat_engine.intent_index = IntentIndex(intents)
+            chat_engine._kb_loaded = True
+            params = {"intents": len(intents), "source": "kb" if label == "kb" else "synthetic"}
+            nxt = cycle(messages)
+            out.append(result("kb", f"chat_engine.get_kb_context[intents={label}]", params,
+                              lambda: chat_engine.get_kb_context(nxt()), args))
+            out.append(result("kb", f"chat_engine.get_fallback_response[intents={label}]", params,
+                              lambda: chat_engine.get_fallback_response(nxt()), args))
+    finally:
+        chat_engine.intents, chat_engine.intent_index, chat_engine._kb_loaded = saved
+    return out
+
+def bench_db(args, rng):
+    import database
+    out = []
+    for rows in args.rows:
+        database.DB_NAME = synthetic_db(rows, args.seed, args.data_dir)
+        database.close_all()
+        conn = database.get_connection()
+        label = f"rows={rows}"
+
+        for kind in ("all", "mood", "journal"):
+            out.append(result("db", f"database.get_history[{label},type={kind}]", {"rows": rows, "type": kind},
+                              lambda kind=kind: database.get_history(type=kind, limit=50), args))
+
+        # a page from the middle of the timeline, and a one-week window there
+        first, last = conn.execute("SELECT MIN(timestamp), MAX(timestamp) FROM moods").fetchone()
+        mid = datetime.datetime.fromisoformat(first) + (datetime.datetime.fromisoformat(last) - datetime.datetime.fromisoformat(first)) / 2
+        page = database.get_history(until=mid.isoformat(), limit=1)
+        if page:
+            cursor = database.make_cursor(page[0])
+            out.append(result("db", f"database.get_history[{label},before=middle]", {"rows": rows, "before": "middle"},
+                              lambda: database.get_history(before=cursor, limit=50), args))
+        since, until = mid.isoformat(), (mid + datetime.timedelta(days=7)).isoformat()
+        out.append(result("db", f"database.get_history[{label},week]", {"rows": rows, "range": "7d"},
+                          lambda: database.get_history(since=since, until=until, limit=500), args))
+
+        # writes go to the shared DB; remove them afterwards so it stays at `rows`
+        max_mood = conn.execute("SELECT COALESCE(MAX(id), 0) FROM moods").fetchone()[0]
+        max_journal = conn.execute("SELECT COALESCE(MAX(id), 0) FROM journals").fetchone()[0]
+        try:
+            out.append(result("db", f"database.save_mood[{label}]", {"rows": rows},
+                              lambda: database.save_mood(3, "bench"), args))
+            entries = cycle(make_messages(rng, 40, FILLER))
+            out.append(result("db", f"database.save_journal[{label}]", {"rows": rows},
+                              lambda: database.save_journal(entries()), args))
+        finally:
+            with conn:
+                conn.execute("DELETE FROM moods WHERE id > ?", (max_mood,))
+                conn.execute("DELETE FROM journals WHERE id > ?", (max_journal,))
+            database.close_all()
+    return out
+
+def load_wellness_backend():
+    """Import models/wellness_backend.py (it loads its files relative to the cwd)."""
+    cwd = os.getcwd()
+    sys.path.insert(0, MODELS_DIR)
+    try:
+        os.chdir(MODELS_DIR)
+        import wellness_backend
+        return wellness_backend
+    finally:
+        os.chdir(cwd)
+        sys.path.remove(MODELS_DIR)
+
+def bench_wellness(args, rng):
+    import numpy as np
+    out = []
+    batch_sizes = (1, 32, 512)
+    try:
+        wb = load_wellness_backend()
+        if wb.wellness_model is None:
+            raise RuntimeError("wellness model failed to load")
+    except Exception as e:
+        # e.g. Flask or NLTK data missing: still time the model on synthetic bags
+        wb = None
+        reason = f"wellness_backend unavailable ({type(e).__name__}: {e})"
+
+    if wb is not None:
+        vocab = list(wb.wellness_words)
+        for size in batch_sizes:
+            sentences = make_messages(rng, 12, vocab, count=size)
+            out.append(result("wellness", f"wellness.bag_of_words_batch[batch={size}]", {"batch": size},
+                              lambda s=sentences: wb.bag_of_words_batch(s), args))
+            out.append(result("wellness", f"wellness.predict_wellness_classes[batch={size}]", {"batch": size},
+                              lambda s=sentences: wb.predict_wellness_classes(s), args))
+        return out
+
+    import numpy_model
+    model = numpy_model.load(os.path.join(MODELS_DIR, "wellness_model.npz"))
+    for size in batch_sizes:
+        out.append(skipped("wellness", f"wellness.bag_of_words_batch[batch={size}]", reason))
+        bags = np.zeros((size, model.input_dim), dtype=np.float32)
+        for row in range(size):
+            bags[row, rng.sample(range(model.input_dim), min(8, model.input_dim))] = 1
+        out.append(result("wellness", f"wellness.model.predict_on_batch[batch={size}]", {"batch": size, "runtime": "numpy"},
+                          lambda b=bags: model.predict_on_batch(b), args))
+    return out
+
+BENCHES = {"safety": bench_safety, "kb": bench_kb, "db": bench_db, "wellness": bench_wellness}
+
+# --- output / comparison ---
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+def metadata(args):
+    import numpy as np
+    return {
+        "version": BENCH_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "sqlite": sqlite3.sqlite_version,
+        "seed": args.seed,
+        "samples": args.samples,
+    }
+
+def compare(current, baseline, threshold):
+    """Print a median-vs-baseline table; returns the names that regressed."""
+    base = {r["name"]: r for r in baseline["results"] if "median" in r}
+    regressions = []
+    print(f"\nComparison against baseline ({baseline['meta'].get('git')}, {baseline['meta'].get('created')}):")
+    for r in current:
+        if "median" not in r:
+            continue
+        old = base.pop(r["name"], None)
+        if old is None:
+            status, change = "new", ""
+        else:
+            ratio = r["median"] / old["median"] - 1
+            change = f"{ratio:+.1%}"
+            if ratio > threshold:
+                status = "REGRESSED"
+                regressions.append(r["name"])
+            elif ratio < -threshold:
+                status = "faster"
+            else:
+                status = "ok"
+        print(f"  {r['name']:<48} {r['median'] * 1e6:>12.2f} us {change:>8}  {status}")
+    for name in base:
+        print(f"  {name:<48} {'':>12}    {'':>8}  missing")
+    return regressions
+
+def int_list(value):
+    return tuple(int(v.replace("_", "")) for v in value.split(",") if v)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the backend hot paths on synthetic data")
+    parser.add_argument("--only", default=",".join(GROUPS), help=f"comma-separated groups ({', '.join(GROUPS)})")
+    parser.add_argument("--lengths", type=int_list, default=DEFAULT_LENGTHS, help="message lengths in words for safety")
+    parser.add_argument("--intents", type=int_list, default=DEFAULT_INTENT_COUNTS, help="synthetic intent counts for kb")
+    parser.add_argument("--rows", type=int_list, default=DEFAULT_ROWS, help="history rows per synthetic DB, e.g. 10000,10000000")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="where synthetic DBs are generated and cached")
+    parser.add_argument("--samples", type=int, default=SAMPLES)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("-o", "--output", help="write results JSON here")
+    parser.add_argument("--compare", metavar="BASELINE", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative median slowdown counted as a regression (default 0.15)")
+    args = parser.parse_args(argv)
+
+    groups = [g for g in args.only.split(",") if g]
+    unknown = [g for g in groups if g not in BENCHES]
+    if unknown:
+        parser.error(f"unknown group(s): {', '.join(unknown)}")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    import database
+    saved_db = database.DB_NAME
+    results = []
+    try:
+        for group in groups:
+            print(f"[{group}]")
+            results.extend(BENCHES[group](args, random.Random(args.seed)))
+    finally:
+        database.close_all()
+        database.DB_NAME = saved_db
+
+    report = {"meta": metadata(args), "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {len(results)} results to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
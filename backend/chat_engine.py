@@ -1,129 +1,481 @@
 import os
 import random
-import json
-from groq import Groq
+import asyncio
+import hashlib
+import threading
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from groq import Groq, AsyncGroq
+from circuit_breaker import CircuitBreaker
 from safety import is_crisis, crisis_message
+from intent_index import IntentIndex, clean_text, STOP_WORDS
+from response_cache import TTLCache
+import kb_artifact
+import metrics
+import prompt_budget
+import singleflight
 
 # Configure Groq
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
+# Optional override, e.g. to point at a local fake server
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+GROQ_MODEL = "llama-3.3-70b-versatile"
+# Upstream deadlines. GROQ_TIMEOUT_SECS bounds how long a chat turn waits for
+# Groq; GROQ_HEDGE_AFTER_SECS > 0 answers from the local engine once the LLM
+# is that late (a sync reply that still arrives goes into the reply cache).
+# After GROQ_BREAKER_FAILURES failures in a row upstream is skipped for
+# GROQ_BREAKER_RESET_SECS (0 failures disables the breaker).
+GROQ_TIMEOUT_SECS = float(os.getenv("GROQ_TIMEOUT_SECS", "15"))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "1"))
+GROQ_HEDGE_AFTER_SECS = float(os.getenv("GROQ_HEDGE_AFTER_SECS", "0"))
+GROQ_BREAKER_FAILURES = int(os.getenv("GROQ_BREAKER_FAILURES", "5"))
+GROQ_BREAKER_RESET_SECS = float(os.getenv("GROQ_BREAKER_RESET_SECS", "30"))
+# threads running sync Groq calls, so a request can stop waiting on one
+GROQ_WORKERS = int(os.getenv("GROQ_WORKERS", "64"))
 if GROQ_API_KEY:
-    client = Groq(api_key=GROQ_API_KEY)
+    client = Groq(api_key=GROQ_API_KEY, base_url=GROQ_BASE_URL, timeout=GROQ_TIMEOUT_SECS, max_retries=GROQ_MAX_RETRIES)
+    # used by the streaming endpoint so slow completions don't hold a threadpool worker
+    async_client = AsyncGroq(api_key=GROQ_API_KEY, base_url=GROQ_BASE_URL, timeout=GROQ_TIMEOUT_SECS, max_retries=GROQ_MAX_RETRIES)
+    upstream_pool = ThreadPoolExecutor(max_workers=GROQ_WORKERS, thread_name_prefix="groq")
 else:
     client = None
+    async_client = None
+    upstream_pool = None
+breaker = CircuitBreaker(GROQ_BREAKER_FAILURES, GROQ_BREAKER_RESET_SECS)
+upstream_flight = singleflight.Group("upstream")
+
+# Reply cache for repeated turns ("I can't sleep", "suggest a song")
+# LLM_CACHE_SIZE=0 turns it off; turns carrying journal memory are skipped
+# unless LLM_CACHE_PERSONALIZED=1
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "256"))
+LLM_CACHE_TTL_SECS = float(os.getenv("LLM_CACHE_TTL_SECS", "600"))
+LLM_CACHE_PERSONALIZED = os.getenv("LLM_CACHE_PERSONALIZED", "0") == "1"
+HISTORY_TURNS = 10
+NO_JOURNALS = "No recent journals."
+# Ground on the journals that match the message (full-text index), topped
+# up with the latest ones, instead of only the latest 3. Off by default: it
+# costs an FTS query per turn whenever the user has more journals than fit
+# the prompt (repeat searches are cached until a journal is written)
+RELEVANT_JOURNALS = os.getenv("CHAT_RELEVANT_JOURNALS", "0") == "1"
+JOURNALS_IN_PROMPT = 3
+# (journals version, search terms) -> matching journals
+relevant_journals_cache = TTLCache(maxsize=256, ttl=LLM_CACHE_TTL_SECS)
+SUMMARY_HEADER = "\n\nEARLIER IN THIS CONVERSATION (summary):\n"
+response_cache = TTLCache(maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL_SECS)
 
 # Local Modules
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODELS_DIR = os.path.join(BASE_DIR, "models")
 intents = []
+intent_index = IntentIndex([])
+_kb_loaded = False
+_kb_lock = threading.Lock()
 
 def init():
-    global intents
+    # The KB (compiled by kb_artifact.py) is loaded on first use, so cold
+    # starts that never chat don't pay for it
     print("Initializing AI Engine with Wellness & KB Modules...")
-    try:
-        # Load Main KB
-        kb_path = os.path.join(MODELS_DIR, "KB.json")
-        if os.path.exists(kb_path):
-            with open(kb_path, "r") as f:
-                intents.extend(json.load(f).get("intents", []))
-        
-        # Load Wellness Module (User specifically requested this)
-        wellness_path = os.path.join(MODELS_DIR, "wellness_module.json")
-        if os.path.exists(wellness_path):
-            with open(wellness_path, "r") as f:
-                intents.extend(json.load(f).get("intents", []))
-                
-        print(f"Loaded {len(intents)} total intent categories.")
-    except Exception as e:
-        print(f"Error loading modules: {e}")
 
-STOP_WORDS = {"a", "an", "the", "is", "are", "was", "were", "be", "been", "being", "in", "on", "at", "by", "for", "with", "about", "against", "between", "into", "through", "during", "before", "after", "above", "below", "to", "from", "up", "down", "in", "out", "off", "over", "under", "again", "further", "then", "once", "here", "there", "when", "where", "why", "how", "all", "any", "both", "each", "few", "more", "most", "other", "some", "such", "no", "nor", "not", "only", "own", "same", "so", "than", "too", "very", "s", "t", "can", "will", "just", "don", "should", "now", "it", "what", "i", "me", "my", "myself", "we", "our", "ours", "ourselves", "you", "your", "yours", "yourself", "yourselves", "he", "him", "his", "himself", "she", "her", "hers", "herself", "it", "its", "itself", "they", "them", "their", "theirs", "themselves", "am", "u"}
+def ensure_kb():
+    global intents, intent_index, _kb_loaded
+    if _kb_loaded:
+        return
+    with _kb_lock:
+        if _kb_loaded:
+            return
+        try:
+            intents, intent_index = kb_artifact.load(MODELS_DIR)
+            print(f"Loaded {len(intents)} total intent categories.")
+        except Exception as e:
+            print(f"Error loading modules: {e}")
+        _kb_loaded = True
+
 
-def clean_text(text):
-    import re
-    text = text.lower()
-    text = re.sub(r"[^\w\s']", "", text)
-    return text
+def select_grounding(message, top_k=3):
+    """Top ranked KB/Wellness intents for a message."""
+    ensure_kb()
+    if not intents: return []
+    return [intent for intent, _score in intent_index.search(message, top_k=top_k)]
 
-def get_kb_context(message):
+def get_kb_context(message, top_k=3, grounding=None, snippet_tokens=None):
     """Retrieve relevant responses from KB/Wellness to ground Groq's answers."""
-    if not intents: return ""
-    
-    msg_clean = clean_text(message)
-    msg_words = set(msg_clean.split())
+    if grounding is None:
+        grounding = select_grounding(message, top_k=top_k)
     
     context_bits = []
-    for intent in intents:
-        for pattern in intent.get('patterns', []):
-            pattern_words = set(clean_text(pattern).split())
-            if pattern_words & msg_words:
-                context_bits.append(f"Source Data for {intent['tag']}: {random.choice(intent['responses'])}")
-                break 
+    for intent in grounding:
+        snippet = random.choice(intent['responses'])
+        if snippet_tokens:
+            snippet = prompt_budget.truncate(snippet, snippet_tokens)
+        context_bits.append(f"Source Data for {intent['tag']}: {snippet}")
     
-    return "\n".join(context_bits[:3]) # Limit to top 3 relevant context bits
+    return "\n".join(context_bits) # Top ranked relevant context bits
+
+def explain_match(message, top_k=5):
+    """Debug helper: ranked intents with their scores for a message."""
+    ensure_kb()
+    return intent_index.explain(message, top_k=top_k)
+
+def find_relevant_journals(message, n=JOURNALS_IN_PROMPT):
+    """Journals sharing content words with message, best match first."""
+    import database
+    terms = [t for t in database.search_terms(message) if t not in STOP_WORDS]
+    if not terms:
+        return []
+    # the version only moves when a journal is written, so repeat searches skip SQLite
+    version = database.get_recent_journals_version()
+    key = (version, n, tuple(terms)) if version is not None else None
+    if key is not None:
+        cached = relevant_journals_cache.get(key)
+        if cached is not None:
+            return list(cached)
+    hits = database.search_journals(" ".join(terms), limit=n, any_term=True, prefix=False)
+    if key is not None:
+        relevant_journals_cache.put(key, tuple(hits))
+    return hits
 
-def get_journal_summary():
-    """Fetch last 3 journal entries for life event memory."""
+def get_journal_summary(message=None):
+    """Fetch 3 journal entries for life event memory: relevant to message if given, else the latest."""
     try:
         import database
-        history = database.get_history()
-        journals = [h['text'] for h in history if h['type'] == 'journal'][:3]
-        if not journals: return "No recent journals."
-        return "User's Recent Journal Entries: " + " | ".join(journals)
+        # one extra tells whether every journal is already in memory
+        recent = database.get_recent_journals(JOURNALS_IN_PROMPT + 1)
+        searchable = message and RELEVANT_JOURNALS and len(recent) > JOURNALS_IN_PROMPT
+        picked = find_relevant_journals(message) if searchable else []
+        seen = {h['id'] for h in picked}
+        for h in recent[:JOURNALS_IN_PROMPT]:
+            if len(picked) >= JOURNALS_IN_PROMPT:
+                break
+            if h['id'] not in seen:
+                picked.append(h)
+        journals = [h['text'] for h in picked]
+        if not journals: return NO_JOURNALS
+        label = "User's Journal Entries (related first)" if seen else "User's Recent Journal Entries"
+        return f"{label}: " + " | ".join(journals)
     except:
         return ""
 
 def get_fallback_response(message):
+    ensure_kb()
     if not intents: return "I'm here to listen."
-    # (Basic keyword matching logic used for grounding but also for total failure fallback)
-    msg_words = set(clean_text(message).split())
-    for intent in intents:
-        for pattern in intent.get('patterns', []):
-            if set(clean_text(pattern).split()) & msg_words:
-                return random.choice(intent['responses'])
+    # (Same index used for grounding, also serves the total failure fallback)
+    best = intent_index.search(message, top_k=1)
+    if best:
+        return random.choice(best[0][0]['responses'])
     return "I'm listening. Tell me more about that?"
 
-def predict(message, history=None, mood_context="neutral"):
-    if is_crisis(message):
+def response_cache_key(message, history, mood_context, grounding, journal_memory, summary=""):
+    """Cache key for a turn, or None when the turn shouldn't be cached.
+
+    history is what actually goes into the prompt, summary the digest of older turns.
+    """
+    if response_cache.maxsize <= 0:
+        return None
+    if journal_memory != NO_JOURNALS and not LLM_CACHE_PERSONALIZED:
+        return None
+    h = hashlib.sha1()
+    for turn in (history or [])[-HISTORY_TURNS:]:
+        h.update(f"{turn.get('role')}\x1f{turn.get('content')}\x1e".encode("utf-8"))
+    h.update(summary.encode("utf-8"))
+    if LLM_CACHE_PERSONALIZED:
+        h.update(journal_memory.encode("utf-8"))
+    return (
+        " ".join(clean_text(message).replace("'", "").split()),
+        tuple(intent['tag'] for intent in grounding),
+        mood_context,
+        h.hexdigest(),
+    )
+
+def fit_prompt(message, history=None, mood_context="neutral", grounding=None, journal_memory=None,
+               budget=prompt_budget.PROMPT_TOKEN_BUDGET):
+    """Grounded system prompt plus as many recent turns as fit the token budget.
+
+    Returns (messages, history summary); turns that didn't fit are only in the summary.
+    """
+    # INTEGRATION: Grounding with Wellness Module and KB
+    module_grounding = get_kb_context(message, grounding=grounding, snippet_tokens=prompt_budget.SNIPPET_TOKENS)
+    if journal_memory is None:
+        journal_memory = get_journal_summary(message)
+    journal_memory = prompt_budget.truncate(journal_memory, prompt_budget.JOURNAL_TOKENS)
+    message = prompt_budget.truncate_middle(message, int(budget * prompt_budget.MESSAGE_SHARE))
+    
+    system_instruction = (
+        "You are a specialized Mental Health Companion.\n\n"
+        "STRICT GROUNDING RULE:\n"
+        f"Use the following SOURCE DATA to inform your tone and specific advice:\n{module_grounding}\n\n"
+        "CONTEXT:\n"
+        f"- Real-time user mood: {mood_context}\n"
+        f"- User's recent journals: {journal_memory}\n\n"
+        "RESPONSE RULES:\n"
+        "1. Always respond line-by-line. Never write paragraphs.\n"
+        "2. If identity is questioned, use the specific tone and phrasing from the SOURCE DATA provided above.\n"
+        "3. Prioritize the advice (yoga, breathing, etc.) found in the SOURCE DATA.\n"
+        "4. Be warm, brotherly, and empathetic.\n"
+        "5. Conciseness: Maximum 3-4 lines."
+    )
+
+    remaining = (budget - prompt_budget.message_tokens(system_instruction) - prompt_budget.message_tokens(message)
+                 - prompt_budget.count_tokens(SUMMARY_HEADER))
+    context_messages, summary = prompt_budget.fit_history(history, remaining, HISTORY_TURNS)
+    if summary:
+        system_instruction += SUMMARY_HEADER + summary
+
+    messages = [{"role": "system", "content": system_instruction}]
+    for h in context_messages:
+        role = "user" if h['role'] == 'user' else "assistant"
+        messages.append({"role": role, "content": h['content']})
+    
+    messages.append({"role": "user", "content": message})
+    return messages, summary
+
+def build_messages(message, history=None, mood_context="neutral", grounding=None, journal_memory=None):
+    """Assemble the grounded system prompt plus recent turns for Groq."""
+    return fit_prompt(message, history, mood_context, grounding=grounding, journal_memory=journal_memory)[0]
+
+def prepare_turn(message, history=None, mood_context="neutral"):
+    """Build the upstream messages and the reply cache key for one turn."""
+    with metrics.timer("kb"):
+        grounding = select_grounding(message)
+    with metrics.timer("journal"):
+        journal_memory = get_journal_summary(message)
+    with metrics.timer("prompt"):
+        messages, summary = fit_prompt(message, history, mood_context, grounding=grounding, journal_memory=journal_memory)
+        # key on the turns that were actually sent (messages[1:-1]) plus the summary
+        key = response_cache_key(message, messages[1:-1], mood_context, grounding, journal_memory, summary)
+    return messages, key
+
+def fallback_reply(message):
+    """get_fallback_response(), timed as the "fallback" stage."""
+    with metrics.timer("fallback"):
+        return get_fallback_response(message)
+
+def record_upstream(start, mode, outcome):
+    """Groq call latency; outcome is success, fallback (empty reply), error, timeout or hedged."""
+    seconds = time.perf_counter() - start
+    metrics.observe("mhc_upstream_seconds", seconds, help="Groq call latency by outcome", mode=mode, outcome=outcome)
+    metrics.add_timing("groq", seconds)
+
+def count_reply(source):
+    # source: llm, cache, fallback or crisis
+    metrics.inc("mhc_chat_replies_total", help="Chat replies by where they came from", source=source)
+
+def count_skipped(mode, reason):
+    # reason: circuit_open, hedged, timeout or overloaded -- the turn was answered locally
+    metrics.inc("mhc_upstream_skipped_total", help="Chat turns answered locally instead of waiting for Groq", mode=mode, reason=reason)
+
+def first_deadline():
+    """Seconds to wait for the reply (sync) or the first token (stream) before answering locally."""
+    if 0 < GROQ_HEDGE_AFTER_SECS < GROQ_TIMEOUT_SECS:
+        return GROQ_HEDGE_AFTER_SECS
+    return GROQ_TIMEOUT_SECS
+
+def complete(messages, key, start):
+    """Blocking Groq call, run on upstream_pool; settles the breaker and caches the reply even if nobody waits anymore."""
+    try:
+        completion = client.chat.completions.create(
+            model=GROQ_MODEL,
+            messages=messages,
+            temperature=0.7,
+            max_tokens=300,
+        )
+    except Exception as e:
+        print(f"Groq Error: {e}")
+        breaker.record_failure()
+        record_upstream(start, "sync", "error")
+        raise
+    breaker.record_success()
+    reply = completion.choices[0].message.content
+    record_upstream(start, "sync", "success" if reply else "fallback")
+    if reply and key is not None:
+        response_cache.put(key, reply)
+    return reply
+
+def predict(message, history=None, mood_context="neutral", crisis=None):
+    # crisis: the caller's is_crisis(message) verdict, if it already has one
+    if crisis is None:
+        crisis = is_crisis(message)
+    if crisis:
+        count_reply("crisis")
         return crisis_message()
 
     if client:
+        start = None
+        try:
+            messages, key = prepare_turn(message, history, mood_context)
+            if key is not None:
+                cached = response_cache.get(key)
+                if cached is not None:
+                    count_reply("cache")
+                    return cached
+
+            start = time.perf_counter()
+            # identical turns in flight at the same time share one Groq call
+            call, leader = upstream_flight.claim(key)
+            if leader:
+                if not breaker.allow():
+                    upstream_flight.finish(call, result=None)  # anyone who joined falls back too
+                    count_skipped("sync", "circuit_open")
+                    count_reply("fallback")
+                    return fallback_reply(message)
+                # copy_context keeps the call's timings on this request's Server-Timing
+                upstream_flight.start(call, upstream_pool, contextvars.copy_context().run, complete, messages, key, start)
+            wait = first_deadline()
+            try:
+                reply = upstream_flight.wait(call, wait)
+            except FutureTimeout:
+                if upstream_flight.abandon(call):
+                    # never started (all workers busy); give back a half-open trial slot
+                    breaker.release()
+                count_skipped("sync", "timeout" if wait >= GROQ_TIMEOUT_SECS else "hedged")
+                count_reply("fallback")
+                return fallback_reply(message)
+            if not reply:
+                count_reply("fallback")
+                return fallback_reply(message)
+            count_reply("llm")
+            return reply
+        except Exception as e:
+            if start is None:
+                # upstream errors were already logged and recorded by complete()
+                print(f"Groq Error: {e}")
+            count_reply("fallback")
+            return fallback_reply(message)
+    else:
+        count_reply("fallback")
+        return fallback_reply(message)
+
+async def predict_stream(message, history=None, mood_context="neutral", crisis=None):
+    """Async version of predict() that yields events as the reply is generated.
+
+    Events are dicts: {"type": "token", "text": ...} for each new chunk, or
+    {"type": "replace", "text": ...} when the reply so far must be swapped
+    for the local fallback (upstream failed or ran past GROQ_TIMEOUT_SECS
+    mid-stream). crisis is the caller's is_crisis(message) verdict, if any.
+    """
+    if crisis is None:
+        crisis = is_crisis(message)
+    if crisis:
+        count_reply("crisis")
+        yield {"type": "token", "text": crisis_message()}
+        return
+
+    if not async_client:
+        count_reply("fallback")
+        yield {"type": "token", "text": fallback_reply(message)}
+        return
+
+    sent_any = False
+    parts = []
+    start = None
+    settled = False
+    stream = None
+    call = None
+    try:
+        # prompt assembly may hit SQLite for journals, keep it off the event loop
+        messages, key = await asyncio.to_thread(prepare_turn, message, history, mood_context)
+        if key is not None:
+            cached = response_cache.get(key)
+            if cached is not None:
+                count_reply("cache")
+                yield {"type": "token", "text": cached}
+                return
+        call, leader = upstream_flight.claim(key)
+        if not leader:
+            # an identical turn is already asking Groq: wait for its whole reply,
+            # at most as long as that call itself may take
+            try:
+                reply = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(call.future)), timeout=GROQ_TIMEOUT_SECS)
+            except asyncio.TimeoutError:
+                upstream_flight.timed_out()
+                upstream_flight.abandon(call)
+                count_skipped("stream", "timeout")
+                reply = None
+            except Exception:
+                reply = None  # the leader already logged and recorded the upstream error
+            call = None
+            count_reply("llm" if reply else "fallback")
+            yield {"type": "token", "text": reply or fallback_reply(message)}
+            return
+        if not breaker.allow():
+            settled = True
+            count_skipped("stream", "circuit_open")
+            count_reply("fallback")
+            yield {"type": "token", "text": fallback_reply(message)}
+            return
+        start = time.perf_counter()
+        first_by = start + first_deadline()
+        deadline = start + GROQ_TIMEOUT_SECS
         try:
-            # INTEGRATION: Grounding with Wellness Module and KB
-            module_grounding = get_kb_context(message)
-            journal_memory = get_journal_summary()
-            
-            system_instruction = (
-                "You are a specialized Mental Health Companion.\n\n"
-                "STRICT GROUNDING RULE:\n"
-                f"Use the following SOURCE DATA to inform your tone and specific advice:\n{module_grounding}\n\n"
-                "CONTEXT:\n"
-                f"- Real-time user mood: {mood_context}\n"
-                f"- User's recent journals: {journal_memory}\n\n"
-                "RESPONSE RULES:\n"
-                "1. Always respond line-by-line. Never write paragraphs.\n"
-                "2. If identity is questioned, use the specific tone and phrasing from the SOURCE DATA provided above.\n"
-                "3. Prioritize the advice (yoga, breathing, etc.) found in the SOURCE DATA.\n"
-                "4. Be warm, brotherly, and empathetic.\n"
-                "5. Conciseness: Maximum 3-4 lines."
-            )
-
-            messages = [{"role": "system", "content": system_instruction}]
-            context_messages = (history or [])[-10:]
-            for h in context_messages:
-                role = "user" if h['role'] == 'user' else "assistant"
-                messages.append({"role": role, "content": h['content']})
-            
-            messages.append({"role": "user", "content": message})
-            
-            completion = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
+            stream = await asyncio.wait_for(async_client.chat.completions.create(
+                model=GROQ_MODEL,
                 messages=messages,
                 temperature=0.7,
                 max_tokens=300,
-            )
-            return completion.choices[0].message.content
-        except Exception as e:
-            print(f"Groq Error: {e}")
-            return get_fallback_response(message)
-    else:
-        return get_fallback_response(message)
+                stream=True,
+            ), timeout=first_by - time.perf_counter())
+            chunks = stream.__aiter__()
+            while True:
+                remaining = (deadline if sent_any else first_by) - time.perf_counter()
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(remaining, 0))
+                except StopAsyncIteration:
+                    break
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    if not sent_any:
+                        metrics.observe("mhc_upstream_first_token_seconds", time.perf_counter() - start, help="Time until Groq streams the first token")
+                    sent_any = True
+                    parts.append(text)
+                    yield {"type": "token", "text": text}
+        except asyncio.TimeoutError:
+            settled = True
+            hedged = not sent_any and first_by < deadline
+            if hedged:
+                # slow but not failed: the trial slot goes back, no verdict
+                breaker.release()
+            else:
+                breaker.record_failure()
+            print(f"Groq Stream {'hedged' if hedged else 'timed out'} after {time.perf_counter() - start:.1f}s")
+            record_upstream(start, "stream", "hedged" if hedged else "timeout")
+            count_skipped("stream", "hedged" if hedged else "timeout")
+            count_reply("fallback")
+            yield {"type": "replace" if sent_any else "token", "text": fallback_reply(message)}
+            return
+        settled = True
+        breaker.record_success()
+        if not sent_any:
+            record_upstream(start, "stream", "fallback")
+            count_reply("fallback")
+            yield {"type": "token", "text": fallback_reply(message)}
+            return
+        record_upstream(start, "stream", "success")
+        count_reply("llm")
+        reply = "".join(parts)
+        if key is not None:
+            response_cache.put(key, reply)
+        upstream_flight.finish(call, result=reply)
+    except Exception as e:
+        print(f"Groq Stream Error: {e}")
+        if start is not None:
+            if not settled:
+                settled = True
+                breaker.record_failure()
+            record_upstream(start, "stream", "error")
+        count_reply("fallback")
+        fallback = fallback_reply(message)
+        yield {"type": "replace" if sent_any else "token", "text": fallback}
+    finally:
+        if call is not None:
+            # no-op after a successful reply; otherwise whoever joined falls back
+            upstream_flight.finish(call, result=None)
+        if start is not None and not settled:
+            # client went away mid-stream; that says nothing about Groq
+            breaker.release()
+        if stream is not None:
+            try:
+                await stream.close()
+            except Exception:
+                pass
@@ -1,30 +1,27 @@
-import sqlite3
 import os
+import database
 
-DB_NAME = "mood_journal.db"
+DB_NAME = database.DB_NAME
 
 def check_db():
     if not os.path.exists(DB_NAME):
         print(f"Database {DB_NAME} does not exist.")
         return
 
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
+    conn = database.get_connection()
     c = conn.cursor()
 
     print("--- Moods ---")
     c.execute("SELECT * FROM moods")
-    rows = c.fetchall()
-    for row in rows:
+    for row in c:
         print(dict(row))
 
     print("--- Journals ---")
     c.execute("SELECT * FROM journals")
-    rows = c.fetchall()
-    for row in rows:
+    for row in c:
         print(dict(row))
 
-    conn.close()
+    database.close_all()
 
 if __name__ == "__main__":
     check_db()
@@ -0,0 +1,82 @@
+import threading
+import time
+
+# Circuit breaker for the Groq upstream. After `failure_threshold` failures
+# in a row the circuit opens and callers go straight to the local engine for
+# `reset_timeout` seconds; then a single trial call is let through
+# (half-open) and its result decides whether the circuit closes again.
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """Thread-safe consecutive-failure breaker with a half-open trial call."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.opens = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now):
+        if self._state == OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._trial_running = False
+        return self._state
+
+    def allow(self):
+        """True if a call may go upstream now (claims the trial slot when half-open)."""
+        if self.failure_threshold <= 0:
+            return True
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.opens += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._trial_running = False
+
+    def release(self):
+        """Give back a half-open trial slot without a verdict (call abandoned before it said anything)."""
+        with self._lock:
+            self._trial_running = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self._current_state(time.monotonic()),
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout,
+                "opens": self.opens,
+                "rejected": self.rejected,
+            }
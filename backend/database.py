@@ -1,6 +1,9 @@
 import sqlite3
 import datetime
-from typing import List, Dict
+import re
+import threading
+import time
+from typing import List, Dict, Optional
 
 import os
 
@@ -11,8 +14,172 @@ if os.environ.get('VERCEL'):
 else:
     DB_NAME = "mood_journal.db"
 
+# Connection settings
+BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "5000"))
+CACHE_SIZE_KB = int(os.environ.get("DB_CACHE_SIZE_KB", "8192"))
+CACHED_STATEMENTS = 256
+
+# SQL used on the hot paths, kept as constants so sqlite3's statement cache reuses them
+INSERT_MOOD_SQL = "INSERT INTO moods (mood_value, note, timestamp) VALUES (?, ?, ?)"
+INSERT_JOURNAL_SQL = "INSERT INTO journals (entry, timestamp) VALUES (?, ?)"
+# Imports skip rows that already exist (same timestamp and content), so re-running one is a no-op
+IMPORT_MOOD_SQL = """
+    INSERT INTO moods (mood_value, note, timestamp)
+    SELECT ?, ?, ? WHERE NOT EXISTS (
+        SELECT 1 FROM moods WHERE timestamp = ? AND mood_value IS ? AND note IS ?
+    )
+"""
+IMPORT_JOURNAL_SQL = """
+    INSERT INTO journals (entry, timestamp)
+    SELECT ?, ? WHERE NOT EXISTS (
+        SELECT 1 FROM journals WHERE timestamp = ? AND entry IS ?
+    )
+"""
+
+# /history paging
+HISTORY_TYPES = ("mood", "journal")
+DEFAULT_HISTORY_LIMIT = 50
+MAX_HISTORY_LIMIT = 500
+
+# Recent journals kept in memory for the chat prompt
+RECENT_JOURNALS_SIZE = 10
+# How long the cache trusts itself before checking the journals counter
+# for writes made by other workers
+JOURNAL_CACHE_RECHECK_SECS = float(os.environ.get("JOURNAL_CACHE_RECHECK_SECS", "2"))
+SELECT_COUNTER_SQL = "SELECT value FROM counters WHERE name = ?"
+
+# Mood rollups: SQL giving the bucket key of a timestamp, and the (exclusive)
+# end of a bucket. Weeks start on Monday.
+ROLLUP_BUCKETS = {
+    "day": "substr({ts}, 1, 10)",
+    "week": "date({ts}, '-6 days', 'weekday 1')",
+    "month": "substr({ts}, 1, 7)",
+}
+ROLLUP_BUCKET_ENDS = {
+    "day": "date({b}, '+1 day')",
+    "week": "date({b}, '+7 days')",
+    "month": "date({b} || '-01', '+1 month')",
+}
+# Rows the rollups count: a timestamp SQLite can read (date() is NULL for
+# anything else, which would be a NULL bucket) and a mood value
+ROLLUP_ROW_GUARD = "{row}.timestamp IS NOT NULL AND date({row}.timestamp) IS NOT NULL AND {row}.mood_value IS NOT NULL"
+MOOD_VALUES = range(1, 6)  # distribution columns v1..v5
+DEFAULT_TREND_BUCKETS = 90
+MAX_TREND_BUCKETS = 1000
+
+# Journal full-text search (FTS5 index over journals.entry)
+FTS_TOKENIZE = "porter unicode61 remove_diacritics 2"
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_QUERY_TERMS = 16
+SNIPPET_TOKENS = 16
+HIGHLIGHT = ("**", "**")  # the bold markers the chat UI already renders
+_SEARCH_TERM_RE = re.compile(r"\w+")
+
+# One connection per thread (FastAPI runs sync endpoints in a threadpool)
+_local = threading.local()
+_all_connections = []
+_all_lock = threading.Lock()
+
+def _connect():
+    conn = sqlite3.connect(
+        DB_NAME,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        cached_statements=CACHED_STATEMENTS,
+        check_same_thread=False,  # only so close_all() can run from the shutdown hook
+    )
+    conn.row_factory = sqlite3.Row # Access columns by name
+    # WAL lets readers run while one writer commits, busy_timeout makes writers
+    # from other threads/workers wait instead of failing with "database is locked"
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+def open_connection():
+    """A private connection outside the per-thread pool (e.g. for long exports); caller closes it."""
+    return _connect()
+
+def get_connection():
+    """Return this thread's connection, opening it on first use."""
+    conn = getattr(_local, "conn", None)
+    # reconnect if DB_NAME changed or we are in a forked worker
+    if conn is None or _local.key != (DB_NAME, os.getpid()):
+        conn = _connect()
+        _local.conn = conn
+        _local.key = (DB_NAME, os.getpid())
+        with _all_lock:
+            _all_connections.append(conn)
+    return conn
+
+def close_all():
+    """Close every pooled connection (called on shutdown)."""
+    with _all_lock:
+        conns = list(_all_connections)
+        _all_connections.clear()
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    _local.__dict__.clear()
+
+def _rollup_add_sql(row: str, condition: str = None) -> str:
+    # one upsert per period; WHERE (needed by the parser with ON CONFLICT) carries the optional guard
+    dist_names = ", ".join(f"v{v}" for v in MOOD_VALUES)
+    dist_values = ", ".join(f"{row}.mood_value = {v}" for v in MOOD_VALUES)
+    dist_update = ", ".join(f"v{v} = v{v} + excluded.v{v}" for v in MOOD_VALUES)
+    return "".join(f"""
+        INSERT INTO mood_rollups (period, bucket, count, total, min_value, max_value, {dist_names})
+        SELECT '{period}', {expr.format(ts=row + ".timestamp")}, 1, {row}.mood_value, {row}.mood_value, {row}.mood_value, {dist_values}
+        WHERE {condition or 1}
+        ON CONFLICT (period, bucket) DO UPDATE SET
+            count = count + 1,
+            total = total + excluded.total,
+            min_value = MIN(min_value, excluded.min_value),
+            max_value = MAX(max_value, excluded.max_value),
+            {dist_update};""" for period, expr in ROLLUP_BUCKETS.items())
+
+def _rollup_remove_sql(row: str, condition: str = None) -> str:
+    # min/max can't be decremented, so they are recomputed from the bucket's remaining rows
+    dist_update = ", ".join(f"v{v} = v{v} - ({row}.mood_value = {v})" for v in MOOD_VALUES)
+    sql = ""
+    for period, expr in ROLLUP_BUCKETS.items():
+        bucket = expr.format(ts=row + ".timestamp")
+        end = ROLLUP_BUCKET_ENDS[period].format(b=bucket)
+        in_bucket = f"FROM moods WHERE timestamp >= {bucket} AND timestamp < {end}"
+        sql += f"""
+        UPDATE mood_rollups SET
+            count = count - 1,
+            total = total - {row}.mood_value,
+            min_value = (SELECT MIN(mood_value) {in_bucket}),
+            max_value = (SELECT MAX(mood_value) {in_bucket}),
+            {dist_update}
+        WHERE period = '{period}' AND bucket = {bucket}{f" AND {condition}" if condition else ""};"""
+    return sql + f"""
+        DELETE FROM mood_rollups WHERE count <= 0;"""
+
+def rebuild_mood_rollups():
+    """Recompute every mood rollup from the moods table (backfill / repair)."""
+    conn = get_connection()
+    dist_names = ", ".join(f"v{v}" for v in MOOD_VALUES)
+    dist_sums = ", ".join(f"SUM(mood_value = {v})" for v in MOOD_VALUES)
+    with conn:
+        conn.execute("DELETE FROM mood_rollups")
+        for period, expr in ROLLUP_BUCKETS.items():
+            bucket = expr.format(ts="timestamp")
+            conn.execute(f"""
+                INSERT INTO mood_rollups (period, bucket, count, total, min_value, max_value, {dist_names})
+                SELECT '{period}', {bucket}, COUNT(*), SUM(mood_value), MIN(mood_value), MAX(mood_value), {dist_sums}
+                FROM moods
+                WHERE {ROLLUP_ROW_GUARD.format(row="moods")}
+                GROUP BY {bucket}
+            """)
+
 def init_db():
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection()
     c = conn.cursor()
     
     # Create tables if not exist
@@ -33,54 +200,462 @@ def init_db():
         )
     ''')
     
+    # History is read newest first, per table and merged in SQL
+    c.execute("CREATE INDEX IF NOT EXISTS idx_moods_timestamp ON moods (timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_journals_timestamp ON journals (timestamp)")
+    
+    # Change counters, bumped by triggers in the same transaction as the write
+    # so every worker sharing the file sees the same value
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    c.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('journals', 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS journals_counter_{event.lower()} AFTER {event} ON journals
+            BEGIN
+                UPDATE counters SET value = value + 1 WHERE name = 'journals';
+            END
+        ''')
+    # 'history' moves on every mood/journal write (the /history ETag). It starts
+    # at a random point so a recreated database doesn't reuse versions that
+    # clients may still hold for the old one.
+    c.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('history', abs(random() % 1000000000000))")
+    for table in ("moods", "journals"):
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            c.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS history_counter_{table}_{event.lower()} AFTER {event} ON {table}
+                BEGIN
+                    UPDATE counters SET value = value + 1 WHERE name = 'history';
+                END
+            ''')
+    
+    # Full-text index over journal entries. External content (no second copy
+    # of the text); triggers keep it in step with journals, and a database
+    # that predates it gets a one-time rebuild from the journals table.
+    try:
+        had_fts = c.execute("SELECT 1 FROM sqlite_master WHERE name = 'journals_fts'").fetchone()
+        c.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS journals_fts USING fts5(
+                entry, content='journals', content_rowid='id', tokenize='{FTS_TOKENIZE}'
+            )
+        ''')
+        c.execute('''
+            CREATE TRIGGER IF NOT EXISTS journals_fts_insert AFTER INSERT ON journals
+            BEGIN
+                INSERT INTO journals_fts (rowid, entry) VALUES (NEW.id, NEW.entry);
+            END
+        ''')
+        c.execute('''
+            CREATE TRIGGER IF NOT EXISTS journals_fts_delete AFTER DELETE ON journals
+            BEGIN
+                INSERT INTO journals_fts (journals_fts, rowid, entry) VALUES ('delete', OLD.id, OLD.entry);
+            END
+        ''')
+        c.execute('''
+            CREATE TRIGGER IF NOT EXISTS journals_fts_update AFTER UPDATE OF entry ON journals
+            BEGIN
+                INSERT INTO journals_fts (journals_fts, rowid, entry) VALUES ('delete', OLD.id, OLD.entry);
+                INSERT INTO journals_fts (rowid, entry) VALUES (NEW.id, NEW.entry);
+            END
+        ''')
+        if not had_fts:
+            c.execute("INSERT INTO journals_fts (journals_fts) VALUES ('rebuild')")
+    except sqlite3.OperationalError as e:
+        print(f"FTS5 unavailable ({e}), journal search falls back to LIKE.")
+    _fts_tables.clear()
+    
+    # Per day/week/month mood aggregates, kept current by triggers on moods so
+    # every writer (save_mood, save_batch, import_batch) updates them in its
+    # own transaction
+    dist_cols = ", ".join(f"v{v} INTEGER NOT NULL DEFAULT 0" for v in MOOD_VALUES)
+    c.execute(f'''
+        CREATE TABLE IF NOT EXISTS mood_rollups (
+            period TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            min_value INTEGER,
+            max_value INTEGER,
+            {dist_cols},
+            PRIMARY KEY (period, bucket)
+        ) WITHOUT ROWID
+    ''')
+    # recreated on every start so databases made before a guard change pick it up
+    for name in ("insert", "delete", "update"):
+        c.execute(f"DROP TRIGGER IF EXISTS moods_rollup_{name}")
+    new_ok, old_ok = ROLLUP_ROW_GUARD.format(row="NEW"), ROLLUP_ROW_GUARD.format(row="OLD")
+    c.execute(f'''
+        CREATE TRIGGER moods_rollup_insert AFTER INSERT ON moods
+        WHEN {new_ok}
+        BEGIN {_rollup_add_sql("NEW")} END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER moods_rollup_delete AFTER DELETE ON moods
+        WHEN {old_ok}
+        BEGIN {_rollup_remove_sql("OLD")} END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER moods_rollup_update AFTER UPDATE OF mood_value, timestamp ON moods
+        BEGIN
+            {_rollup_remove_sql("OLD", old_ok)}
+            {_rollup_add_sql("NEW", new_ok)}
+        END
+    ''')
+    conn.commit()
+    # one-time backfill for databases that had moods before the rollups existed
+    has_moods = c.execute("SELECT EXISTS (SELECT 1 FROM moods)").fetchone()[0]
+    has_rollups = c.execute("SELECT EXISTS (SELECT 1 FROM mood_rollups)").fetchone()[0]
+    if has_moods and not has_rollups:
+        rebuild_mood_rollups()
+    
+    # Server-side chat sessions (see sessions.py); turns are numbered 1..n per session
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            id TEXT PRIMARY KEY,
+            turns INTEGER NOT NULL DEFAULT 0,
+            created TEXT,
+            updated TEXT
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS chat_turns (
+            session_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp TEXT,
+            PRIMARY KEY (session_id, seq)
+        ) WITHOUT ROWID
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated ON chat_sessions(updated)")
+    
     conn.commit()
-    conn.close()
     print(f"Database {DB_NAME} initialized.")
 
-def save_mood(mood: int, note: str):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    ts = datetime.datetime.now().isoformat()
-    c.execute("INSERT INTO moods (mood_value, note, timestamp) VALUES (?, ?, ?)", (mood, note, ts))
-    conn.commit()
-    conn.close()
+def now_ts() -> str:
+    return datetime.datetime.now().isoformat()
 
-def save_journal(entry: str):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    ts = datetime.datetime.now().isoformat()
-    c.execute("INSERT INTO journals (entry, timestamp) VALUES (?, ?)", (entry, ts))
-    conn.commit()
-    conn.close()
+def save_mood(mood: int, note: str, ts: str = None):
+    conn = get_connection()
+    ts = ts or now_ts()
+    with conn:
+        conn.execute(INSERT_MOOD_SQL, (mood, note, ts))
 
-def get_history():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row # Access columns by name
-    c = conn.cursor()
-    
+def save_journal(entry: str, ts: str = None):
+    conn = get_connection()
+    ts = ts or now_ts()
+    with conn:
+        cur = conn.execute(INSERT_JOURNAL_SQL, (entry, ts))
+        version = conn.execute(SELECT_COUNTER_SQL, ("journals",)).fetchone()[0]
+    _remember_journal({"type": "journal", "id": cur.lastrowid, "text": entry, "date": ts}, version)
+
+def save_batch(moods: List[tuple], journals: List[tuple]):
+    """Insert many (mood, note, ts) and (entry, ts) rows in one transaction (one fsync)."""
+    conn = get_connection()
+    with conn:
+        if moods:
+            conn.executemany(INSERT_MOOD_SQL, moods)
+        if journals:
+            conn.executemany(INSERT_JOURNAL_SQL, journals)
+    if journals:
+        # several journals landed at once, let the next read reload them
+        with _recent_lock:
+            _recent_journals["version"] = None
+
+def import_batch(moods: List[tuple], journals: List[tuple]):
+    """Idempotent insert of (mood, note, ts) and (entry, ts) rows; returns (moods added, journals added)."""
+    conn = get_connection()
+    with conn:
+        added_moods = conn.executemany(IMPORT_MOOD_SQL, [(v, n, ts, ts, v, n) for v, n, ts in moods]).rowcount if moods else 0
+        added_journals = conn.executemany(IMPORT_JOURNAL_SQL, [(e, ts, ts, e) for e, ts in journals]).rowcount if journals else 0
+    if added_journals:
+        with _recent_lock:
+            _recent_journals["version"] = None
+    return added_moods, added_journals
+
+def get_counter(name: str) -> int:
+    row = get_connection().execute(SELECT_COUNTER_SQL, (name,)).fetchone()
+    return row[0] if row else 0
+
+def get_history_version() -> int:
+    """Change version of moods + journals; only reads the counters table."""
+    return get_counter("history")
+
+# In-process copy of the newest journals: {"version": counter value, "entries": [...], "checked": monotonic time}
+_recent_journals = {"version": None, "entries": [], "checked": 0.0}
+_recent_lock = threading.Lock()
+
+def _remember_journal(item: Dict, version: int):
+    # our own write: extend the cache if it was current right before it
+    with _recent_lock:
+        if _recent_journals["version"] == version - 1:
+            _recent_journals["entries"] = ([item] + _recent_journals["entries"])[:RECENT_JOURNALS_SIZE]
+            _recent_journals["version"] = version
+        else:
+            _recent_journals["version"] = None
+
+def get_recent_journals(n: int = 3) -> List[Dict]:
+    """Newest journals from memory; reloads only when the journals counter moved."""
+    now = time.monotonic()
+    with _recent_lock:
+        if _recent_journals["version"] is not None and now - _recent_journals["checked"] < JOURNAL_CACHE_RECHECK_SECS:
+            return _recent_journals["entries"][:n]
+
+    version = get_counter("journals")
+    with _recent_lock:
+        if _recent_journals["version"] == version:
+            _recent_journals["checked"] = now
+            return _recent_journals["entries"][:n]
+
+    entries = get_history(type="journal", limit=RECENT_JOURNALS_SIZE)
+    with _recent_lock:
+        _recent_journals["entries"] = entries
+        _recent_journals["version"] = version
+        _recent_journals["checked"] = now
+    return entries[:n]
+
+def get_recent_journals_version():
+    """Journals counter the in-memory recent journals were loaded at (None until loaded or after a reset)."""
+    with _recent_lock:
+        return _recent_journals["version"]
+
+def create_session(session_id: str, ts: str = None):
+    ts = ts or now_ts()
+    conn = get_connection()
+    with conn:
+        conn.execute("INSERT INTO chat_sessions (id, turns, created, updated) VALUES (?, 0, ?, ?)", (session_id, ts, ts))
+
+def get_session_length(session_id: str, active_since: str = None) -> Optional[int]:
+    """Number of stored turns, or None if the session doesn't exist (or has had no turns since active_since)."""
+    row = get_connection().execute(
+        "SELECT turns FROM chat_sessions WHERE id = ? AND (? IS NULL OR COALESCE(updated, created, '') >= ?)",
+        (session_id, active_since, active_since),
+    ).fetchone()
+    return row[0] if row else None
+
+def get_session_turns(session_id: str, after: int = 0) -> List[Dict]:
+    """Turns with seq > after, oldest first, as {"role", "content"}."""
+    rows = get_connection().execute(
+        "SELECT role, content FROM chat_turns WHERE session_id = ? AND seq > ? ORDER BY seq",
+        (session_id, after),
+    )
+    return [{"role": row["role"], "content": row["content"]} for row in rows]
+
+def append_session_turns(session_id: str, turns: List[Dict], ts: str = None) -> Optional[int]:
+    """Append turns in one transaction; returns the new length, or None if the session is gone."""
+    ts = ts or now_ts()
+    conn = get_connection()
+    with conn:
+        # bumping the length first takes the write lock, so concurrent appends get distinct seqs
+        cur = conn.execute("UPDATE chat_sessions SET turns = turns + ?, updated = ? WHERE id = ?", (len(turns), ts, session_id))
+        if cur.rowcount == 0:
+            return None
+        length = conn.execute("SELECT turns FROM chat_sessions WHERE id = ?", (session_id,)).fetchone()[0]
+        first = length - len(turns) + 1
+        conn.executemany(
+            "INSERT INTO chat_turns (session_id, seq, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+            [(session_id, first + i, turn["role"], turn["content"], ts) for i, turn in enumerate(turns)],
+        )
+    return length
+
+def delete_session(session_id: str) -> bool:
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM chat_turns WHERE session_id = ?", (session_id,))
+        return conn.execute("DELETE FROM chat_sessions WHERE id = ?", (session_id,)).rowcount > 0
+
+def prune_sessions(idle_before: str) -> int:
+    """Delete sessions, and their turns, that have had no turns since idle_before; returns how many."""
+    conn = get_connection()
+    idle = "SELECT id FROM chat_sessions WHERE COALESCE(updated, created, '') < ?"
+    with conn:
+        conn.execute(f"DELETE FROM chat_turns WHERE session_id IN ({idle})", (idle_before,))
+        return conn.execute(f"DELETE FROM chat_sessions WHERE id IN ({idle})", (idle_before,)).rowcount
+
+def get_mood_trends(period: str = "day", since: str = None, until: str = None,
+                    limit: int = DEFAULT_TREND_BUCKETS) -> List[Dict]:
+    """Mood aggregates per bucket, oldest first, read straight from mood_rollups.
+
+    Buckets overlapping [since, until) are returned; without since, the newest `limit` buckets.
+    """
+    if period not in ROLLUP_BUCKETS:
+        raise ValueError(f"Invalid trend period: {period!r}")
+    limit = max(1, min(int(limit), MAX_TREND_BUCKETS))
+    where = ["period = ?"]
+    params = [period]
+    if since:
+        where.append(f"bucket >= {ROLLUP_BUCKETS[period].format(ts='?')}")
+        params.append(since)
+    if until:
+        where.append("bucket < ?")
+        params.append(until)
+    order = "ASC" if since else "DESC"
+    rows = get_connection().execute(
+        f"SELECT * FROM mood_rollups WHERE {' AND '.join(where)} ORDER BY bucket {order} LIMIT ?",
+        params + [limit],
+    ).fetchall()
+    if order == "DESC":
+        rows.reverse()
+    return [
+        {
+            "bucket": row["bucket"],
+            "count": row["count"],
+            "mean": row["total"] / row["count"],
+            "min": row["min_value"],
+            "max": row["max_value"],
+            "distribution": {str(v): row[f"v{v}"] for v in MOOD_VALUES},
+        }
+        for row in rows
+    ]
+
+# DB_NAME -> whether journals_fts exists there
+_fts_tables = {}
+
+def has_fts() -> bool:
+    if DB_NAME not in _fts_tables:
+        row = get_connection().execute("SELECT 1 FROM sqlite_master WHERE name = 'journals_fts'").fetchone()
+        _fts_tables[DB_NAME] = row is not None
+    return _fts_tables[DB_NAME]
+
+def search_terms(text: str) -> List[str]:
+    return _SEARCH_TERM_RE.findall(text.lower())[:MAX_QUERY_TERMS]
+
+def fts_query(terms: List[str], any_term: bool = False, prefix: bool = True) -> str:
+    """FTS5 MATCH expression for plain words; quoting each term keeps user input out of the query syntax."""
+    parts = [f'"{term}"' for term in terms]
+    if prefix and parts:
+        parts[-1] += "*"  # search-as-you-type on the last word
+    return (" OR " if any_term else " ").join(parts)
+
+def search_journals(query: str, limit: int = DEFAULT_SEARCH_LIMIT, offset: int = 0,
+                    any_term: bool = False, prefix: bool = True) -> List[Dict]:
+    """Journals matching query, best match first, with a highlighted snippet.
+
+    All words must match unless any_term; the last word also matches as a prefix.
+    """
+    terms = search_terms(query)
+    if not terms:
+        raise ValueError("Search query has no words")
+    limit = max(1, min(int(limit), MAX_SEARCH_LIMIT))
+    offset = max(0, int(offset))
+    conn = get_connection()
+
+    if has_fts():
+        rows = conn.execute(
+            """
+            SELECT j.id, j.entry, j.timestamp, bm25(journals_fts) AS score,
+                   snippet(journals_fts, 0, ?, ?, '…', ?) AS snippet
+            FROM journals_fts JOIN journals j ON j.id = journals_fts.rowid
+            WHERE journals_fts MATCH ?
+            ORDER BY rank
+            LIMIT ? OFFSET ?
+            """,
+            (HIGHLIGHT[0], HIGHLIGHT[1], SNIPPET_TOKENS, fts_query(terms, any_term, prefix), limit, offset),
+        ).fetchall()
+        return [
+            {"type": "journal", "id": row["id"], "text": row["entry"], "date": row["timestamp"],
+             "snippet": row["snippet"], "score": -row["score"]}
+            for row in rows
+        ]
+
+    # No FTS5 in this SQLite build: full scan, newest first
+    like = [f"%{term}%" for term in terms]
+    where = (" OR " if any_term else " AND ").join("entry LIKE ?" for _ in like)
+    rows = conn.execute(
+        f"SELECT id, entry, timestamp FROM journals WHERE {where} ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+        like + [limit, offset],
+    ).fetchall()
+    return [
+        {"type": "journal", "id": row["id"], "text": row["entry"], "date": row["timestamp"],
+         "snippet": row["entry"][:200], "score": None}
+        for row in rows
+    ]
+
+def make_cursor(item: Dict) -> str:
+    """Keyset cursor for a history item: everything after it sorts older."""
+    return f"{item['date']}|{item['type']}|{item['id']}"
+
+def parse_cursor(cursor: str):
+    ts, kind, row_id = cursor.rsplit("|", 2)
+    if kind not in HISTORY_TYPES:
+        raise ValueError(f"Invalid history cursor: {cursor!r}")
+    return ts, kind, int(row_id)
+
+def _history_branch(kind: str, cursor, since, until, limit: int):
+    # One side of the UNION ALL, newest first, walking idx_<table>_timestamp
+    if kind == "mood":
+        select = "SELECT 'mood' AS type, id, mood_value AS val, note, NULL AS text, timestamp FROM moods"
+    else:
+        select = "SELECT 'journal' AS type, id, NULL AS val, NULL AS note, entry AS text, timestamp FROM journals"
+    where = []
+    params = []
+    if cursor:
+        ts, cursor_kind, row_id = cursor
+        # Rows sort by (timestamp, type, id) descending; 'mood' > 'journal'
+        if kind == cursor_kind:
+            where.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+            params.extend([ts, ts, row_id])
+        elif kind < cursor_kind:
+            where.append("timestamp <= ?")
+            params.append(ts)
+        else:
+            where.append("timestamp < ?")
+            params.append(ts)
+    if since:
+        where.append("timestamp >= ?")
+        params.append(since)
+    if until:
+        where.append("timestamp < ?")
+        params.append(until)
+    sql = select
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+    params.append(limit)
+    return f"SELECT * FROM ({sql})", params
+
+def get_history(type: str = "all", before: str = None, limit: int = DEFAULT_HISTORY_LIMIT,
+                since: str = None, until: str = None) -> List[Dict]:
+    """Newest-first page of moods and/or journals.
+
+    `before` is a cursor from make_cursor() of the last item on the previous page,
+    `since`/`until` are ISO timestamps bounding the range (until is exclusive).
+    """
+    kinds = HISTORY_TYPES if type == "all" else (type,)
+    if any(kind not in HISTORY_TYPES for kind in kinds):
+        raise ValueError(f"Invalid history type: {type!r}")
+    limit = max(1, min(int(limit), MAX_HISTORY_LIMIT))
+    cursor = parse_cursor(before) if before else None
+
+    parts = []
+    params = []
+    for kind in kinds:
+        sql, branch_params = _history_branch(kind, cursor, since, until, limit)
+        parts.append(sql)
+        params.extend(branch_params)
+    sql = " UNION ALL ".join(parts) + " ORDER BY timestamp DESC, type DESC, id DESC LIMIT ?"
+    params.append(limit)
+
+    conn = get_connection()
     history = []
-    
-    # Get Moods
-    c.execute("SELECT id, mood_value, note, timestamp FROM moods ORDER BY timestamp DESC LIMIT 50")
-    for row in c.fetchall():
-        history.append({
-            "type": "mood",
-            "val": row["mood_value"],
-            "note": row["note"],
-            "date": row["timestamp"]
-        })
-        
-    # Get Journals
-    c.execute("SELECT id, entry, timestamp FROM journals ORDER BY timestamp DESC LIMIT 50")
-    for row in c.fetchall():
-        history.append({
-            "type": "journal",
-            "text": row["entry"],
-            "date": row["timestamp"]
-        })
-    
-    conn.close()
-    
-    # Sort combined list by date descending
-    history.sort(key=lambda x: x['date'], reverse=True)
+    for row in conn.execute(sql, params):
+        if row["type"] == "mood":
+            history.append({
+                "type": "mood",
+                "id": row["id"],
+                "val": row["val"],
+                "note": row["note"],
+                "date": row["timestamp"]
+            })
+        else:
+            history.append({
+                "type": "journal",
+                "id": row["id"],
+                "text": row["text"],
+                "date": row["timestamp"]
+            })
     return history
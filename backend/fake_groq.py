@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Offline stand-in for the Groq (OpenAI-compatible) chat completions API, for
+# load tests and local development without an API key or network:
+#
+#   cd backend
+#   python fake_groq.py --port 8090 --latency-ms 400 --latency-dist lognormal --error-rate 0.02
+#   GROQ_API_KEY=fake GROQ_BASE_URL=http://127.0.0.1:8090 uvicorn main:app
+#
+# Latency is the time to the full reply (or to the first token when
+# streaming); streamed tokens then follow every --token-ms. The same settings
+# can be given as FAKE_GROQ_* environment variables when running
+# `uvicorn fake_groq:app` directly.
+
+DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+CONFIG = {
+    "latency_ms": float(os.getenv("FAKE_GROQ_LATENCY_MS", "300")),
+    "latency_dist": os.getenv("FAKE_GROQ_LATENCY_DIST", "lognormal"),
+    "sigma": float(os.getenv("FAKE_GROQ_SIGMA", "0.5")),  # lognormal spread
+    "token_ms": float(os.getenv("FAKE_GROQ_TOKEN_MS", "15")),
+    "tokens": int(os.getenv("FAKE_GROQ_TOKENS", "40")),
+    "error_rate": float(os.getenv("FAKE_GROQ_ERROR_RATE", "0")),
+    "error_status": int(os.getenv("FAKE_GROQ_ERROR_STATUS", "500")),
+    "stream_error_rate": float(os.getenv("FAKE_GROQ_STREAM_ERROR_RATE", "0")),  # drop the connection mid-stream
+    "seed": os.getenv("FAKE_GROQ_SEED"),
+}
+
+REPLY_LINES = [
+    "I hear you, and what you're feeling makes sense.",
+    "Let's take one slow breath together, in for four and out for six.",
+    "You don't have to figure everything out tonight.",
+    "Maybe a short walk or some water could help right now.",
+    "I'm here with you, tell me a little more?",
+]
+
+_rng = random.Random(CONFIG["seed"])
+_stats = {"requests": 0, "streamed": 0, "errors": 0, "stream_errors": 0, "in_flight": 0, "max_in_flight": 0}
+
+app = FastAPI(title="Fake Groq API")
+
+def sample_latency():
+    """Seconds to wait, drawn from the configured distribution around latency_ms."""
+    mean = CONFIG["latency_ms"] / 1000
+    dist = CONFIG["latency_dist"]
+    if mean <= 0:
+        return 0.0
+    if dist == "fixed":
+        return mean
+    if dist == "uniform":
+        return _rng.uniform(0, 2 * mean)
+    if dist == "exponential":
+        return _rng.expovariate(1 / mean)
+    # lognormal with the same mean, long right tail like real LLM latency
+    sigma = CONFIG["sigma"]
+    return _rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+
+def reply_tokens():
+    words = " ".join(_rng.choice(REPLY_LINES) for _ in range(4)).split()
+    tokens = (words * (CONFIG["tokens"] // max(len(words), 1) + 1))[:CONFIG["tokens"]]
+    return [w if i == 0 else " " + w for i, w in enumerate(tokens)]
+
+def completion_id():
+    return f"chatcmpl-fake-{_rng.getrandbits(48):012x}"
+
+def error_response():
+    status = CONFIG["error_status"]
+    headers = {"retry-after": "1"} if status == 429 else None
+    return JSONResponse(
+        {"error": {"message": f"Fake upstream error ({status})", "type": "server_error" if status >= 500 else "rate_limit_exceeded"}},
+        status_code=status,
+        headers=headers,
+    )
+
+@app.post("/openai/v1/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "fake")
+    _stats["requests"] += 1
+    _stats["in_flight"] += 1
+    _stats["max_in_flight"] = max(_stats["max_in_flight"], _stats["in_flight"])
+    try:
+        await asyncio.sleep(sample_latency())
+        if _rng.random() < CONFIG["error_rate"]:
+            _stats["errors"] += 1
+            return error_response()
+    finally:
+        _stats["in_flight"] -= 1
+
+    tokens = reply_tokens()
+    created = int(time.time())
+    cid = completion_id()
+    if not body.get("stream"):
+        return {
+            "id": cid,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+        }
+
+    _stats["streamed"] += 1
+    fail_at = _rng.randrange(1, len(tokens)) if len(tokens) > 1 and _rng.random() < CONFIG["stream_error_rate"] else None
+
+    def chunk(delta, finish_reason=None):
+        data = {
+            "id": cid,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(data)}\n\n"
+
+    async def events():
+        yield chunk({"role": "assistant", "content": ""})
+        for i, token in enumerate(tokens):
+            if i == fail_at:
+                _stats["stream_errors"] += 1
+                raise RuntimeError("fake mid-stream failure")
+            if i and CONFIG["token_ms"] > 0:
+                await asyncio.sleep(CONFIG["token_ms"] / 1000)
+            yield chunk({"content": token})
+        yield chunk({}, "stop")
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.get("/stats")
+def stats():
+    return dict(_stats, config=CONFIG)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Groq/OpenAI chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=CONFIG["latency_ms"], help="mean time to reply / first token")
+    parser.add_argument("--latency-dist", default=CONFIG["latency_dist"], help=f"one of {', '.join(DISTRIBUTIONS)}")
+    parser.add_argument("--sigma", type=float, default=CONFIG["sigma"], help="lognormal shape (bigger = longer tail)")
+    parser.add_argument("--token-ms", type=float, default=CONFIG["token_ms"], help="delay between streamed tokens")
+    parser.add_argument("--tokens", type=int, default=CONFIG["tokens"], help="tokens per reply")
+    parser.add_argument("--error-rate", type=float, default=CONFIG["error_rate"], help="fraction of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=CONFIG["error_status"])
+    parser.add_argument("--stream-error-rate", type=float, default=CONFIG["stream_error_rate"], help="fraction of streams cut off mid-reply")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+    if args.latency_dist not in DISTRIBUTIONS:
+        parser.error(f"--latency-dist must be one of {', '.join(DISTRIBUTIONS)}")
+
+    CONFIG.update({k: v for k, v in vars(args).items() if k in CONFIG})
+    if args.seed is not None:
+        _rng.seed(args.seed)
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import math
+import re
+from collections import defaultdict, deque
+
+# Shared intent matcher for KB/Wellness patterns, used by chat_engine and the
+# Flask wellness API (models/wellness_api.py). Two structures are built once:
+#  - an inverted index (token -> patterns) scored with BM25, so a message only
+#    touches the postings of its own words
+#  - a token-level Aho-Corasick automaton over whole patterns, so a message that
+#    contains a pattern verbatim ("period pain") is recognised in one pass
+
+_PUNCT_RE = re.compile(r"[^\w\s']")
+
+# Extra score, as a fraction of the pattern's own weight, when the whole
+# pattern appears as a phrase in the message
+PHRASE_BONUS = 0.5
+
+# Words too common to say anything about intent ("i", "am", "the"). They are
+# left out of the index and of the query, so they neither score nor count
+# towards confidence; a pattern made only of them ("how are you") keeps them.
+STOP_WORDS = {"a", "an", "the", "is", "are", "was", "were", "be", "been", "being", "in", "on", "at", "by", "for", "with", "about", "against", "between", "into", "through", "during", "before", "after", "above", "below", "to", "from", "up", "down", "in", "out", "off", "over", "under", "again", "further", "then", "once", "here", "there", "when", "where", "why", "how", "all", "any", "both", "each", "few", "more", "most", "other", "some", "such", "no", "nor", "not", "only", "own", "same", "so", "than", "too", "very", "s", "t", "can", "will", "just", "don", "should", "now", "it", "what", "i", "me", "my", "myself", "we", "our", "ours", "ourselves", "you", "your", "yours", "yourself", "yourselves", "he", "him", "his", "himself", "she", "her", "hers", "herself", "it", "its", "itself", "they", "them", "their", "theirs", "themselves", "am", "u"}
+
+def clean_text(text):
+    text = text.lower()
+    text = _PUNCT_RE.sub("", text)
+    return text
+
+def _fold_plural(token):
+    # crude, but the same on both sides: "exercise" finds "exercises"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+_STOP_TOKENS = {_fold_plural(w) for w in STOP_WORDS}
+
+def tokenize(text):
+    return [_fold_plural(t) for t in clean_text(text).split()]
+
+def content_tokens(tokens):
+    """tokens without stop words, or all of them if that would leave nothing."""
+    return [t for t in tokens if t not in _STOP_TOKENS] or tokens
+
+class PhraseAutomaton:
+    """Aho-Corasick over token sequences; word boundaries come for free."""
+
+    def __init__(self, phrases):
+        # state -> {token: next state}, fail links and phrase ids ending in each state
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for phrase_id, tokens in enumerate(phrases):
+            if not tokens:
+                continue
+            state = 0
+            for token in tokens:
+                nxt = self.goto[state].get(token)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][token] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = nxt
+            self.output[state].append(phrase_id)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and token not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(token, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def find(self, tokens):
+        """Set of phrase ids occurring in tokens."""
+        found = set()
+        state = 0
+        for token in tokens:
+            while state and token not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(token, 0)
+            found.update(self.output[state])
+        return found
+
+class IntentIndex:
+    """BM25 index where every pattern is a document and an intent scores as its best pattern."""
+
+    def __init__(self, intents, k1=1.2, b=0.75):
+        self.intents = list(intents)
+        self.k1 = k1
+        self.b = b
+
+        # pattern id -> (intent id, token set, token count)
+        self.patterns = []
+        # token -> [pattern id, ...]
+        self.postings = defaultdict(list)
+        phrases = []
+
+        for intent_id, intent in enumerate(self.intents):
+            for pattern in intent.get('patterns', []):
+                tokens = tokenize(pattern)
+                if not tokens:
+                    continue
+                pattern_id = len(self.patterns)
+                content = content_tokens(tokens)
+                token_set = frozenset(content)
+                self.patterns.append((intent_id, token_set, len(content)))
+                phrases.append(tokens)  # verbatim phrases keep their stop words
+                for token in token_set:
+                    self.postings[token].append(pattern_id)
+
+        self.postings = dict(self.postings)
+        total = sum(length for _, _, length in self.patterns)
+        self.avg_len = (total / len(self.patterns)) if self.patterns else 0.0
+
+        # Pattern tokens are sets, so term frequency is always 1 and the
+        # BM25 weight of a token only depends on the pattern length.
+        # Document frequency is counted per intent: a word repeated across the
+        # patterns of one intent ("yoga") is what identifies it, not noise.
+        n = len({intent_id for intent_id, _, _ in self.patterns})
+        self.idf = {}
+        for token, ids in self.postings.items():
+            df = len({self.patterns[pattern_id][0] for pattern_id in ids})
+            self.idf[token] = math.log(1 + (n - df + 0.5) / (df + 0.5))
+        # Score a message gets when it contains every word of the pattern;
+        # used to turn scores into a 0-1 confidence
+        self.full_scores = [
+            sum(self.idf[token] for token in token_set) * self._tf_weight(length)
+            for _, token_set, length in self.patterns
+        ]
+        self.phrases = PhraseAutomaton(phrases)
+
+    def __len__(self):
+        return len(self.intents)
+
+    def to_state(self):
+        """Plain data needed to rebuild the index without re-tokenizing (see kb_artifact)."""
+        return {
+            "k1": self.k1,
+            "b": self.b,
+            "patterns": self.patterns,
+            "postings": self.postings,
+            "idf": self.idf,
+            "avg_len": self.avg_len,
+            "full_scores": self.full_scores,
+            "phrases": (self.phrases.goto, self.phrases.fail, self.phrases.output),
+        }
+
+    @classmethod
+    def from_state(cls, intents, state):
+        index = cls.__new__(cls)
+        index.intents = list(intents)
+        index.k1 = state["k1"]
+        index.b = state["b"]
+        index.patterns = state["patterns"]
+        index.postings = state["postings"]
+        index.idf = state["idf"]
+        index.avg_len = state["avg_len"]
+        index.full_scores = state["full_scores"]
+        index.phrases = PhraseAutomaton.__new__(PhraseAutomaton)
+        index.phrases.goto, index.phrases.fail, index.phrases.output = state["phrases"]
+        return index
+
+    def _tf_weight(self, length):
+        norm = 1 - self.b + self.b * (length / self.avg_len) if self.avg_len else 1
+        return (self.k1 + 1) / (1 + self.k1 * norm)
+
+    def score(self, message):
+        """Return {intent id: (score, confidence, matched tokens, phrase)} for every intent sharing a word with message.
+
+        confidence is the share of the best pattern's weight the message covers
+        (1.0 when the pattern appears verbatim).
+        """
+        tokens = tokenize(message)
+        pattern_scores = defaultdict(float)
+        pattern_matches = defaultdict(list)
+        for token in set(content_tokens(tokens)):
+            ids = self.postings.get(token)
+            if not ids:
+                continue
+            idf = self.idf[token]
+            for pattern_id in ids:
+                pattern_scores[pattern_id] += idf * self._tf_weight(self.patterns[pattern_id][2])
+                pattern_matches[pattern_id].append(token)
+
+        phrase_hits = self.phrases.find(tokens)
+        for pattern_id in phrase_hits:
+            # verbatim hit on a pattern none of whose content words were searched
+            # ("how are you" inside "how are you doing")
+            if pattern_id not in pattern_scores:
+                pattern_scores[pattern_id] = 0.0
+                pattern_matches[pattern_id] = sorted(self.patterns[pattern_id][1])
+
+        best = {}
+        for pattern_id, value in pattern_scores.items():
+            full = self.full_scores[pattern_id]
+            phrase = pattern_id in phrase_hits
+            confidence = 1.0 if phrase else (value / full if full else 0.0)
+            if phrase:
+                value += PHRASE_BONUS * full
+            intent_id = self.patterns[pattern_id][0]
+            if intent_id not in best or (value, confidence) > best[intent_id][:2]:
+                best[intent_id] = (value, confidence, pattern_matches[pattern_id], phrase)
+        return best
+
+    def _ranked(self, message):
+        scored = self.score(message)
+        return sorted(scored.items(), key=lambda item: (-item[1][0], item[0]))
+
+    def search(self, message, top_k=3):
+        """Return up to top_k (intent, score) pairs, best first."""
+        return [(self.intents[intent_id], hit[0]) for intent_id, hit in self._ranked(message)[:top_k]]
+
+    def match(self, message, min_confidence=0.0):
+        """Best intent as {"intent", "tag", "score", "confidence", "phrase"}, or None."""
+        ranked = self._ranked(message)
+        if not ranked:
+            return None
+        intent_id, (value, confidence, _, phrase) = ranked[0]
+        if confidence < min_confidence:
+            return None
+        intent = self.intents[intent_id]
+        return {
+            "intent": intent,
+            "tag": intent.get('tag'),
+            "score": value,
+            "confidence": confidence,
+            "phrase": phrase,
+        }
+
+    def explain(self, message, top_k=5):
+        """Debug view of search(): tags, scores, confidence and the words that matched."""
+        return [
+            {
+                "tag": self.intents[intent_id].get('tag'),
+                "score": round(value, 4),
+                "confidence": round(confidence, 4),
+                "phrase": phrase,
+                "matched": sorted(tokens),
+            }
+            for intent_id, (value, confidence, tokens, phrase) in self._ranked(message)[:top_k]
+        ]
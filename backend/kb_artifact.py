@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+import pickle
+
+from intent_index import IntentIndex
+
+# Build step for the chat KB: KB.json + wellness_module.json are compiled into
+# one pickle holding the intents and the ready-made IntentIndex tables, so a
+# cold start unpickles instead of parsing JSON and re-tokenizing every pattern.
+# The artifact records a hash of each source file; if they don't match (or the
+# artifact is missing/old) we fall back to building from the JSON.
+#
+#   cd backend && python kb_artifact.py
+
+ARTIFACT_VERSION = 3
+PICKLE_PROTOCOL = 4  # readable by the Python 3.9 runtime on Vercel
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+ARTIFACT_PATH = os.path.join(MODELS_DIR, "kb_index.pkl")
+# Order matters: KB intents first, then the Wellness Module
+SOURCES = ("KB.json", "wellness_module.json")
+
+def _source_paths(models_dir):
+    return [os.path.join(models_dir, name) for name in SOURCES]
+
+def source_hashes(models_dir=MODELS_DIR):
+    hashes = {}
+    for path in _source_paths(models_dir):
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                hashes[os.path.basename(path)] = hashlib.sha256(f.read()).hexdigest()
+    return hashes
+
+def load_sources(models_dir=MODELS_DIR):
+    intents = []
+    for path in _source_paths(models_dir):
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                intents.extend(json.load(f).get("intents", []))
+    return intents
+
+def build(models_dir=MODELS_DIR, out_path=ARTIFACT_PATH):
+    intents = load_sources(models_dir)
+    index = IntentIndex(intents)
+    artifact = {
+        "version": ARTIFACT_VERSION,
+        "sources": source_hashes(models_dir),
+        "intents": intents,
+        "index": index.to_state(),
+    }
+    with open(out_path, "wb") as f:
+        pickle.dump(artifact, f, protocol=PICKLE_PROTOCOL)
+    print(f"Compiled {len(intents)} intents into {out_path}")
+    return intents, index
+
+def load(models_dir=MODELS_DIR, path=ARTIFACT_PATH):
+    """Return (intents, IntentIndex) from the artifact, or from the JSON if it is stale."""
+    try:
+        with open(path, "rb") as f:
+            artifact = pickle.load(f)
+        if artifact.get("version") != ARTIFACT_VERSION:
+            raise ValueError(f"artifact version {artifact.get('version')} != {ARTIFACT_VERSION}")
+        if artifact.get("sources") != source_hashes(models_dir):
+            raise ValueError("KB sources changed since the artifact was built")
+        intents = artifact["intents"]
+        return intents, IntentIndex.from_state(intents, artifact["index"])
+    except Exception as e:
+        print(f"KB artifact unusable ({e}), building from JSON.")
+    intents = load_sources(models_dir)
+    return intents, IntentIndex(intents)
+
+if __name__ == "__main__":
+    build()
@@ -0,0 +1,251 @@
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+# Async load generator for the API (main.app) and the Flask wellness backend.
+#
+#   cd backend
+#   python loadgen.py --url http://127.0.0.1:8000 --scenario chat --concurrency 32 --duration 30
+#   python loadgen.py --url http://127.0.0.1:8000 --scenario chat-stream --rps 20 --duration 30
+#   python loadgen.py --in-process --scenario chat --concurrency 16     # drives main.app directly
+#   python loadgen.py --url http://127.0.0.1:5001 --scenario wellness --concurrency 8
+#
+# --concurrency N runs N closed-loop workers; --rps R sends on a fixed (or
+# --poisson) schedule regardless of how fast replies come back, and measures
+# latency from the scheduled send time so queueing shows up in the tail.
+# Pair with fake_groq.py to run fully offline.
+
+SCENARIOS = ("chat", "chat-stream", "mood", "journal", "history", "wellness")
+MESSAGES = [
+    "I can't sleep at night",
+    "I feel so stressed about my exams",
+    "suggest a song for a sad day",
+    "how do I calm down during a panic attack",
+    "I had a fight with my family",
+    "I want to try some yoga",
+    "breathing exercises please",
+    "I feel lonely lately",
+    "work is burning me out",
+    "I keep overthinking everything",
+]
+DEFAULT_DURATION_SECS = 20
+DEFAULT_TIMEOUT_SECS = 60
+MAX_IN_FLIGHT = 2000
+
+def request_for(scenario, rng, seq, unique):
+    """(method, path, json body, streamed) for one request of a scenario."""
+    message = rng.choice(MESSAGES)
+    if unique:
+        # defeats the reply cache so every turn reaches the upstream
+        message = f"{message} ({seq})"
+    if scenario == "chat":
+        return "POST", "/chat", {"history": [], "message": message, "mood": "neutral"}, False
+    if scenario == "chat-stream":
+        return "POST", "/chat/stream", {"history": [], "message": message, "mood": "neutral"}, True
+    if scenario == "mood":
+        return "POST", "/mood", {"mood": rng.randint(1, 5), "note": "load test"}, False
+    if scenario == "journal":
+        return "POST", "/journal", {"entry": f"load test entry {seq}: {message}"}, False
+    if scenario == "history":
+        return "GET", "/history?limit=50", None, False
+    return "POST", "/chat", {"message": message}, False  # wellness_backend
+
+class Recorder:
+    def __init__(self):
+        self.latencies = []
+        self.first_byte = []
+        self.errors = Counter()
+        self.statuses = Counter()
+        self.sent = 0
+        self.dropped = 0
+
+    def ok(self, latency, first_byte=None):
+        self.latencies.append(latency)
+        if first_byte is not None:
+            self.first_byte.append(first_byte)
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))]
+
+def summary(values):
+    values = sorted(values)
+    if not values:
+        return {}
+    return {
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+        "max": values[-1],
+    }
+
+async def send_one(client, scenario, rng, seq, args, rec, started):
+    method, path, body, streamed = request_for(scenario, rng, seq, args.unique)
+    rec.sent += 1
+    try:
+        if streamed:
+            async with client.stream(method, path, json=body) as resp:
+                first = None
+                async for _ in resp.aiter_raw():
+                    if first is None:
+                        first = time.perf_counter() - started
+                rec.statuses[resp.status_code] += 1
+                if resp.status_code >= 400:
+                    rec.errors[f"HTTP {resp.status_code}"] += 1
+                    return
+                # ASGITransport buffers the whole body, so first byte is only meaningful over --url
+                rec.ok(time.perf_counter() - started, None if args.in_process else first)
+        else:
+            resp = await client.request(method, path, json=body)
+            rec.statuses[resp.status_code] += 1
+            if resp.status_code >= 400:
+                rec.errors[f"HTTP {resp.status_code}"] += 1
+                return
+            rec.ok(time.perf_counter() - started)
+    except Exception as e:
+        rec.errors[type(e).__name__] += 1
+
+async def closed_loop(client, args, rec, deadline):
+    seq = itertools.count()
+
+    async def worker(worker_id):
+        rng = random.Random(args.seed * 1000 + worker_id)
+        while time.perf_counter() < deadline:
+            n = next(seq)
+            if args.requests and n >= args.requests:
+                return
+            await send_one(client, args.scenario, rng, n, args, rec, time.perf_counter())
+
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+
+async def open_loop(client, args, rec, deadline):
+    rng = random.Random(args.seed)
+    tasks = set()
+    scheduled = time.perf_counter()
+    for n in itertools.count():
+        if scheduled >= deadline or (args.requests and n >= args.requests):
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(tasks) >= args.max_in_flight:
+            rec.dropped += 1  # the client itself can't keep up; counted, not sent
+        else:
+            task = asyncio.create_task(send_one(client, args.scenario, rng, n, args, rec, scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        gap = rng.expovariate(args.rps) if args.poisson else 1 / args.rps
+        scheduled += gap
+    if tasks:
+        await asyncio.gather(*tasks)
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency or args.max_in_flight, max_keepalive_connections=args.concurrency or 100)
+    timeout = httpx.Timeout(args.timeout)
+    rec = Recorder()
+
+    if args.in_process:
+        # ASGI in-process: no sockets, measures the app itself (startup/shutdown events included)
+        if args.db:
+            import database
+            database.DB_NAME = args.db
+        import main
+        transport = httpx.ASGITransport(app=main.app)
+        lifespan = main.app.router.lifespan_context(main.app)
+    else:
+        transport = None
+        lifespan = None
+
+    async def drive():
+        async with httpx.AsyncClient(base_url=args.url, transport=transport, limits=limits, timeout=timeout) as client:
+            started = time.perf_counter()
+            deadline = started + args.duration
+            if args.rps:
+                await open_loop(client, args, rec, deadline)
+            else:
+                await closed_loop(client, args, rec, deadline)
+            return time.perf_counter() - started
+
+    if lifespan is not None:
+        async with lifespan:
+            elapsed = await drive()
+    else:
+        elapsed = await drive()
+    return report(args, rec, elapsed)
+
+def report(args, rec, elapsed):
+    completed = len(rec.latencies)
+    return {
+        "scenario": args.scenario,
+        "target": "in-process" if args.in_process else args.url,
+        "mode": f"rps={args.rps}" if args.rps else f"concurrency={args.concurrency}",
+        "duration": elapsed,
+        "sent": rec.sent,
+        "ok": completed,
+        "errors": dict(rec.errors),
+        "dropped": rec.dropped,
+        "statuses": {str(k): v for k, v in sorted(rec.statuses.items())},
+        "throughput": completed / elapsed if elapsed else 0.0,
+        "latency": summary(rec.latencies),
+        "first_byte": summary(rec.first_byte),
+    }
+
+def print_report(r):
+    print(f"{r['scenario']} against {r['target']} ({r['mode']}) for {r['duration']:.1f}s")
+    print(f"  sent {r['sent']}, ok {r['ok']}, errors {sum(r['errors'].values())}, dropped {r['dropped']}")
+    print(f"  throughput {r['throughput']:.1f} req/s")
+    for label, key in (("latency", "latency"), ("first byte", "first_byte")):
+        s = r[key]
+        if s:
+            print(f"  {label:<10} p50 {s['p50'] * 1000:.1f} ms  p95 {s['p95'] * 1000:.1f} ms  "
+                  f"p99 {s['p99'] * 1000:.1f} ms  max {s['max'] * 1000:.1f} ms")
+    for reason, count in sorted(r["errors"].items(), key=lambda item: -item[1]):
+        print(f"  error {reason}: {count}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Async load generator for the chatbot APIs")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="base URL of the server under test")
+    parser.add_argument("--in-process", action="store_true", help="drive main.app through ASGI instead of --url")
+    parser.add_argument("--scenario", default="chat", help=f"one of {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=10, help="closed-loop workers (ignored with --rps)")
+    parser.add_argument("--rps", type=float, help="open-loop target requests per second")
+    parser.add_argument("--poisson", action="store_true", help="exponential gaps between sends at --rps")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION_SECS, help="seconds to send for")
+    parser.add_argument("--requests", type=int, help="stop after this many requests")
+    parser.add_argument("--unique", action="store_true", help="make every chat message distinct (bypasses the reply cache)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_SECS)
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT, help="open-loop cap before sends are dropped")
+    parser.add_argument("--db", help="SQLite file for --in-process runs (keeps load-test rows out of mood_journal.db)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.scenario not in SCENARIOS:
+        parser.error(f"--scenario must be one of {', '.join(SCENARIOS)}")
+    if args.in_process and args.scenario == "wellness":
+        parser.error("the wellness backend is a Flask app; run it and use --url")
+    if args.in_process:
+        args.url = "http://loadgen"
+    if args.rps is not None and args.rps <= 0:
+        parser.error("--rps must be positive")
+    if args.rps:
+        args.concurrency = 0
+
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+    return 1 if result["ok"] == 0 else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,29 @@
 # Backend API for mental health chatbot
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from dotenv import load_dotenv
 import os
+import json
+import hashlib
+import zlib
+from concurrent.futures import TimeoutError as FutureTimeout
 
 load_dotenv()
 
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional
 from safety import is_crisis, crisis_message
 import chat_engine  # Helper for ML model
+import write_behind
+import transfer
+import metrics
+import sessions
+import circuit_breaker
+import admission
+import singleflight
 
 app = FastAPI(
     title="Mental Health Companion API",
@@ -24,7 +38,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing", "Retry-After", "ETag"],
 )
+# Per-endpoint latency for /metrics; METRICS_SERVER_TIMING=1 adds Server-Timing headers
+app.add_middleware(metrics.MetricsMiddleware)
+# Compress large responses (history pages, search, exports); SSE streams are left alone
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "1024"))
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_BYTES)
 
 # Initialize Chat Engine on Startup
 @app.on_event("startup")
@@ -32,16 +52,32 @@ async def startup_event():
     chat_engine.init()
     import database
     database.init_db()
+    pruned = sessions.prune(force=True)
+    if pruned:
+        print(f"Deleted {pruned} expired chat sessions.")
+    if write_behind.ENABLED:
+        write_behind.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    import database
+    write_behind.stop()  # flush queued moods/journals first
+    database.close_all()
 
 # Models
+# With session_id (or no history at all) the server keeps the conversation and
+# `history` is only the turns it hasn't seen; without session_id, `history`
+# is the whole conversation as before.
 class ChatRequest(BaseModel):
-    history: List[Dict]
     message: str
+    history: Optional[List[Dict]] = None
     mood: str = "neutral"
+    session_id: Optional[str] = None
 
 class ChatResponse(BaseModel):
     reply: str
     crisis: bool
+    session_id: Optional[str] = None
 
 class MoodRequest(BaseModel):
     mood: int
@@ -50,45 +86,382 @@ class MoodRequest(BaseModel):
 class JournalEntry(BaseModel):
     entry: str
 
+def resolve_session(req: ChatRequest):
+    """(session id, history) for a chat request; session id is None for stateless clients."""
+    if req.session_id is None and req.history is not None:
+        return None, req.history
+    with metrics.timer("session"):
+        session_id = req.session_id
+        history = sessions.get_history(session_id) if session_id else None
+        if history is None:
+            # new conversation, or the session was deleted or idle past
+            # SESSION_EXPIRE_DAYS (see sessions.py): start a fresh one
+            session_id = sessions.create()
+            history = []
+        if req.history:
+            sessions.append(session_id, req.history)
+            history = sessions.get_history(session_id)
+    return session_id, history
+
+def remember_turn(session_id: Optional[str], message: str, reply: str):
+    if session_id:
+        sessions.append(session_id, [{"role": "user", "content": message}, {"role": "bot", "content": reply}])
+
+async def admit(request: Request, mode: str):
+    """Take an LLM slot for this turn (release it with admission.limiter.release()).
+
+    False means no slot: Groq isn't configured, or chat is overloaded and the
+    turn degrades to the local engine. With CHAT_OVERLOAD=reject an
+    overloaded turn gets a 429 with Retry-After instead.
+    """
+    if chat_engine.client is None:
+        return False  # local engine only, nothing to protect
+    with metrics.timer("queue"):
+        try:
+            await admission.limiter.acquire(admission.client_key(request))
+            return True
+        except admission.Rejected as e:
+            if admission.CHAT_OVERLOAD == "reject":
+                raise HTTPException(
+                    status_code=429,
+                    detail="Chat is busy, please retry shortly",
+                    headers={"Retry-After": str(e.retry_after)},
+                )
+            chat_engine.count_skipped(mode, "overloaded")
+            return False
+
+def local_reply(message: str):
+    chat_engine.count_reply("fallback")
+    return chat_engine.fallback_reply(message)
+
 @app.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest):
-    # Safety Check first (Overrides everything)
-    if is_crisis(req.message):
+async def chat(req: ChatRequest, request: Request):
+    # async so that waiting for an LLM slot doesn't hold a threadpool worker;
+    # admitted turns run on admission.threads, not the default threadpool
+    session_id, history = await run_in_threadpool(resolve_session, req)
+
+    # Safety Check first (Overrides everything, never queued)
+    with metrics.timer("crisis"):
+        crisis = is_crisis(req.message)
+    if crisis:
+        chat_engine.count_reply("crisis")
+        reply = crisis_message()
+        await run_in_threadpool(remember_turn, session_id, req.message, reply)
         return ChatResponse(
-            reply=crisis_message(),
-            crisis=True
+            reply=reply,
+            crisis=True,
+            session_id=session_id
         )
     
     # AI Response
+    admitted = await admit(request, "sync")
     try:
-        # Pass history, mood, and context to engine
-        reply = chat_engine.predict(req.message, req.history, mood_context=req.mood)
+        if admitted:
+            # Pass history, mood, and context to engine
+            reply = await admission.run_sync(chat_engine.predict, req.message, history, req.mood, False)
+        elif chat_engine.client is None:
+            reply = await run_in_threadpool(chat_engine.predict, req.message, history, req.mood, False)
+        else:
+            reply = await run_in_threadpool(local_reply, req.message)
     except Exception as e:
         print(f"Chat Error: {e}")
+        metrics.inc("mhc_errors_total", help="Unhandled errors by endpoint", endpoint="/chat")
         reply = "I'm having a bit of trouble connecting to my brain right now. Can we try again?"
+    finally:
+        if admitted:
+            admission.limiter.release()
         
-    return ChatResponse(reply=reply, crisis=False)
+    await run_in_threadpool(remember_turn, session_id, req.message, reply)
+    return ChatResponse(reply=reply, crisis=False, session_id=session_id)
+
+def sse_event(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest, request: Request):
+    # Server-Sent Events: "token" chunks as they arrive, "replace" if the
+    # upstream failed mid-reply, then a final "done" with the crisis flag and session id
+    session_id, history = await run_in_threadpool(resolve_session, req)
+    with metrics.timer("crisis"):
+        crisis = is_crisis(req.message)
+    # the slot is held until the last token is sent
+    admitted = False if crisis else await admit(request, "stream")
+    slot = admission.Slot(admission.limiter) if admitted else None
+
+    async def events():
+        reply = ""
+        try:
+            if crisis:
+                chat_engine.count_reply("crisis")
+                reply = crisis_message()
+                yield sse_event("token", {"text": reply})
+            elif admitted or chat_engine.client is None:
+                try:
+                    async for ev in chat_engine.predict_stream(req.message, history, mood_context=req.mood, crisis=False):
+                        reply = ev["text"] if ev["type"] == "replace" else reply + ev["text"]
+                        yield sse_event(ev["type"], {"text": ev["text"]})
+                except Exception as e:
+                    print(f"Chat Stream Error: {e}")
+                    metrics.inc("mhc_errors_total", help="Unhandled errors by endpoint", endpoint="/chat/stream")
+                    reply = "I'm having a bit of trouble connecting to my brain right now. Can we try again?"
+                    yield sse_event("replace", {"text": reply})
+            else:
+                reply = await run_in_threadpool(local_reply, req.message)
+                yield sse_event("token", {"text": reply})
+        finally:
+            if slot is not None:
+                slot.release()
+        await run_in_threadpool(remember_turn, session_id, req.message, reply)
+        yield sse_event("done", {"crisis": crisis, "session_id": session_id})
+
+    body = events()
+    if slot is not None:
+        slot.release_when_dropped(body)
+    return StreamingResponse(
+        body,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/sessions")
+def create_session():
+    return {"session_id": sessions.create()}
+
+@app.get("/sessions/{session_id}")
+def get_session(session_id: str):
+    # lets a reloaded page redraw the conversation
+    turns = sessions.get_history(session_id)
+    if turns is None:
+        raise HTTPException(status_code=404, detail="Unknown session")
+    return {"session_id": session_id, "turns": turns}
+
+@app.delete("/sessions/{session_id}")
+def delete_session(session_id: str):
+    if not sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Unknown session")
+    return {"status": "deleted"}
+
+def queue_full_error():
+    return HTTPException(
+        status_code=503,
+        detail="Too many writes right now, please retry.",
+        headers={"Retry-After": "1"},
+    )
+
+# durable=true keeps the write synchronous even when write-behind is on.
+# A queued write answers 202 with status "queued": it is not committed yet
+# and may not show up in /history for up to WRITE_BEHIND_FLUSH_SECS
+QUEUED = "queued"
 
 @app.post("/mood")
-def mood(req: MoodRequest):
+def mood(req: MoodRequest, response: Response, durable: bool = False):
     import database
-    database.save_mood(req.mood, req.note)
+    status = "ok"
+    if write_behind.is_running() and not durable:
+        try:
+            write_behind.enqueue_mood(req.mood, req.note)
+        except write_behind.QueueFull:
+            raise queue_full_error()
+        response.status_code = 202
+        status = QUEUED
+    else:
+        database.save_mood(req.mood, req.note)
     return {
-        "status": "ok",
+        "status": status,
         "mood": req.mood,
         "note": req.note
     }
 
 @app.post("/journal")
-def journal(req: JournalEntry):
+def journal(req: JournalEntry, response: Response, durable: bool = False):
     import database
-    database.save_journal(req.entry)
+    status = "saved"
+    if write_behind.is_running() and not durable:
+        try:
+            write_behind.enqueue_journal(req.entry)
+        except write_behind.QueueFull:
+            raise queue_full_error()
+        response.status_code = 202
+        status = QUEUED
+    else:
+        database.save_journal(req.entry)
     return {
-        "status": "saved",
+        "status": status,
         "summary": req.entry[:180]
     }
 
+# Seconds a /history request waits on an identical in-flight query before running its own
+HISTORY_COALESCE_TIMEOUT_SECS = float(os.getenv("HISTORY_COALESCE_TIMEOUT_SECS", "5"))
+history_flight = singleflight.Group("history", timeout=HISTORY_COALESCE_TIMEOUT_SECS)
+
+# Browsers keep the page but revalidate it every time (If-None-Match -> 304)
+HISTORY_CACHE_CONTROL = "private, no-cache"
+
+def history_etag(version: int, args: tuple, gzip: bool = False) -> str:
+    # Strong validator: the DB change version plus the exact query. A strong
+    # tag names one exact byte representation, so clients that accept gzip
+    # (GZipMiddleware compresses their large pages) get their own tag; for a
+    # given version and query the page size, and so the encoding, is fixed
+    digest = hashlib.sha1(repr(args).encode("utf-8")).hexdigest()[:16]
+    return f'"h{version}-{digest}{"-gz" if gzip else ""}"'
+
+def accepts_gzip(request: Request) -> bool:
+    # the same test GZipMiddleware uses to decide whether to compress
+    return "gzip" in request.headers.get("accept-encoding", "")
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
 @app.get("/history")
-def get_history():
+def get_history(
+    request: Request,
+    response: Response,
+    type: str = "all",
+    before: Optional[str] = None,
+    limit: int = 50,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+):
     import database
-    return database.get_history()
\ No newline at end of file
+    args = (type, before, limit, since, until)
+    # Read the version before the rows: a write in between makes the ETag
+    # older than the data (one extra refetch), never newer
+    version = database.get_history_version()
+    etag = history_etag(version, args, gzip=accepts_gzip(request))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        # unchanged since the client's copy; the row tables aren't touched
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": HISTORY_CACHE_CONTROL, "Vary": "Accept-Encoding"})
+    try:
+        # identical concurrent requests (open tabs, dashboards) share one query;
+        # the version in the key keeps a read that started before a write from
+        # answering someone who asked after it
+        try:
+            items = history_flight.do((version,) + args, database.get_history, *args)
+        except FutureTimeout:
+            items = database.get_history(*args)  # the shared query is stuck, run our own
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = HISTORY_CACHE_CONTROL
+    response.headers["Vary"] = "Accept-Encoding"
+    # Full page -> there may be more, hand back the keyset cursor for ?before=
+    if items and len(items) >= max(1, min(limit, database.MAX_HISTORY_LIMIT)):
+        response.headers["X-Next-Cursor"] = database.make_cursor(items[-1])
+    return items
+
+@app.get("/journals/search")
+def search_journals(response: Response, q: str, limit: int = 20, cursor: Optional[str] = None):
+    # Ranked full-text search, **highlighted** snippets; X-Next-Cursor pages further
+    import database
+    try:
+        offset = int(cursor) if cursor else 0
+        items = database.search_journals(q, limit=limit, offset=offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if items and len(items) >= max(1, min(limit, database.MAX_SEARCH_LIMIT)):
+        response.headers["X-Next-Cursor"] = str(offset + len(items))
+    return items
+
+@app.get("/moods/trends")
+def mood_trends(period: str = "day", since: Optional[str] = None, until: Optional[str] = None, limit: int = 90):
+    # Chart data from the rollup tables: one row per day/week/month bucket, oldest first
+    import database
+    try:
+        return database.get_mood_trends(period=period, since=since, until=until, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/export")
+def export_data(type: str = "all", gzip: bool = False):
+    # NDJSON dump of moods/journals, streamed straight from a DB cursor
+    if type not in ("all", "mood", "journal"):
+        raise HTTPException(status_code=400, detail=f"Invalid export type: {type!r}")
+    filename = "mood_journal.ndjson.gz" if gzip else "mood_journal.ndjson"
+    return StreamingResponse(
+        transfer.export_chunks(type, compress=gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.post("/import")
+async def import_data(request: Request, gzip: bool = False):
+    # NDJSON body (gzip with ?gzip=true or Content-Encoding: gzip), written in
+    # chunks as it arrives; rows that already exist are skipped
+    compressed = gzip or request.headers.get("content-encoding", "").lower() == "gzip"
+    decoder = transfer.LineDecoder(compressed)
+    buf = transfer.ImportBuffer()
+    try:
+        async for chunk in request.stream():
+            for line in decoder.feed(chunk):
+                if buf.add(line):
+                    await run_in_threadpool(buf.flush)
+        for line in decoder.finish():
+            buf.add(line)
+        await run_in_threadpool(buf.flush)
+    except zlib.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid gzip body: {e}")
+    return buf.stats
+
+@app.get("/debug/intents")
+def debug_intents(message: str, top_k: int = 5):
+    # Shows how the intent index ranks a message (grounding + fallback)
+    return {
+        "message": message,
+        "matches": chat_engine.explain_match(message, top_k=top_k)
+    }
+
+@app.get("/debug/cache")
+def debug_cache():
+    # Hit/miss counters of the LLM reply cache
+    return chat_engine.response_cache.stats()
+
+@app.get("/debug/write-behind")
+def debug_write_behind():
+    return write_behind.stats()
+
+@app.get("/debug/upstream")
+def debug_upstream():
+    # Circuit breaker state, chat admission and the Groq deadlines in effect
+    return {
+        "breaker": chat_engine.breaker.stats(),
+        "admission": admission.limiter.stats(),
+        "coalescing": {g.name: g.stats() for g in (history_flight, chat_engine.upstream_flight)},
+        "timeout_secs": chat_engine.GROQ_TIMEOUT_SECS,
+        "hedge_after_secs": chat_engine.GROQ_HEDGE_AFTER_SECS,
+        "max_retries": chat_engine.GROQ_MAX_RETRIES,
+    }
+
+def runtime_gauges():
+    # Reply cache, write-behind, circuit breaker, coalescing and chat admission counters, read at scrape time
+    cache = chat_engine.response_cache.stats()
+    yield "mhc_llm_cache_size", "gauge", "Entries in the LLM reply cache", {}, cache["size"]
+    for name in ("hits", "misses", "evictions", "expirations"):
+        yield f"mhc_llm_cache_{name}_total", "counter", f"LLM reply cache {name}", {}, cache[name]
+    yield "mhc_sessions_cached", "gauge", "Chat sessions held in memory", {}, sessions.stats()["size"]
+    wb = write_behind.stats()
+    yield "mhc_write_behind_queued", "gauge", "Rows waiting in the write-behind queue", {}, wb["queued"]
+    for name in ("enqueued", "flushed", "batches", "failed"):
+        yield f"mhc_write_behind_{name}_total", "counter", f"Write-behind {name}", {}, wb[name]
+    br = chat_engine.breaker.stats()
+    for state in (circuit_breaker.CLOSED, circuit_breaker.OPEN, circuit_breaker.HALF_OPEN):
+        yield "mhc_upstream_breaker_state", "gauge", "Groq circuit breaker state (1 = current)", {"state": state}, int(br["state"] == state)
+    yield "mhc_upstream_breaker_opens_total", "counter", "Times the Groq circuit breaker opened", {}, br["opens"]
+    yield "mhc_upstream_breaker_rejected_total", "counter", "Calls skipped while the breaker was open", {}, br["rejected"]
+    for group in (history_flight, chat_engine.upstream_flight):
+        yield "mhc_singleflight_in_flight", "gauge", "Coalesced calls currently in flight", {"group": group.name}, group.stats()["in_flight"]
+    chat = admission.limiter.stats()
+    yield "mhc_chat_active", "gauge", "Chat turns holding an LLM slot", {}, chat["active"]
+    yield "mhc_chat_queued", "gauge", "Chat turns waiting for an LLM slot", {}, chat["queued"]
+    yield "mhc_chat_queued_clients", "gauge", "Clients with chat turns waiting", {}, chat["queued_clients"]
+
+metrics.register_collector(runtime_gauges)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    # Prometheus text format: stage/request/upstream histograms + runtime gauges
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
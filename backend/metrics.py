@@ -0,0 +1,184 @@
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Lightweight in-process metrics, exposed by /metrics in Prometheus text format.
+# Recording is a perf_counter() pair plus one locked bucket increment, cheap
+# enough to leave on in production. Stage timings of the current request are
+# also collected for an optional Server-Timing header.
+
+SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "0") == "1"
+
+# Seconds; covers sub-ms local stages up to slow upstream completions
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        i = 0
+        for bound in self.buckets:
+            if value <= bound:
+                break
+            i += 1
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+# name -> (type, help); series: (name, labels tuple) -> Histogram | float
+_meta = {}
+_series = {}
+_lock = threading.Lock()
+# callables returning [(name, type, help, labels dict, value), ...] read at scrape time
+_collectors = []
+
+# stage timings of the current request: [(stage, seconds), ...] or None
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def observe(name, value, help="", **labels):
+    key = _key(name, labels)
+    with _lock:
+        hist = _series.get(key)
+        if hist is None:
+            _meta.setdefault(name, ("histogram", help))
+            hist = _series[key] = Histogram()
+        hist.observe(value)
+
+def inc(name, amount=1, help="", **labels):
+    key = _key(name, labels)
+    with _lock:
+        _meta.setdefault(name, ("counter", help))
+        _series[key] = _series.get(key, 0) + amount
+
+def register_collector(fn):
+    _collectors.append(fn)
+
+def add_timing(stage, seconds):
+    """Append to the current request's Server-Timing list (no-op outside a request)."""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+def record(stage, seconds):
+    observe("mhc_stage_seconds", seconds, help="Time spent per processing stage", stage=stage)
+    add_timing(stage, seconds)
+
+@contextmanager
+def timer(stage):
+    """Time a block as one stage: with metrics.timer("kb"): ..."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+def server_timing_header(timings):
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings)
+
+class MetricsMiddleware:
+    """ASGI middleware: mhc_request_seconds per endpoint/method/status, plus Server-Timing if enabled.
+
+    Plain ASGI rather than BaseHTTPMiddleware so streamed responses pass
+    straight through and the per-request cost stays at a couple of dict lookups.
+    """
+
+    def __init__(self, app, server_timing=SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings = []
+        _request_timings.set(timings)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if self.server_timing:
+                    elapsed = time.perf_counter() - start
+                    value = server_timing_header(timings + [("total", elapsed)])
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", value.encode("latin-1")))
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Route template, not the raw path, to keep label cardinality bounded
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            observe(
+                "mhc_request_seconds",
+                time.perf_counter() - start,
+                help="End-to-end request latency (streamed responses until the last chunk)",
+                endpoint=endpoint,
+                method=scope["method"],
+                status=str(status[0]),
+            )
+
+def _fmt_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels:
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+def _fmt_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render():
+    """All metrics in Prometheus text exposition format."""
+    with _lock:
+        snapshot = {}
+        for (name, labels), value in _series.items():
+            if isinstance(value, Histogram):
+                value = (list(value.counts), value.sum, value.count, value.buckets)
+            snapshot.setdefault(name, []).append((labels, value))
+        meta = dict(_meta)
+
+    extra = {}
+    for fn in _collectors:
+        try:
+            for name, kind, help, labels, value in fn():
+                meta.setdefault(name, (kind, help))
+                extra.setdefault(name, []).append((tuple(sorted(labels.items())), value))
+        except Exception as e:
+            print(f"Metrics collector failed: {e}")
+
+    lines = []
+    for name in sorted(set(snapshot) | set(extra)):
+        kind, help = meta[name]
+        if help:
+            lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(snapshot.get(name, [])) + sorted(extra.get(name, [])):
+            if kind == "histogram":
+                counts, total, count, buckets = value
+                cumulative = 0
+                for bound, n in zip(list(buckets) + [float("inf")], counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_fmt_labels(labels + (('le', _fmt_value(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_fmt_labels(labels)} {total}")
+                lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+            else:
+                lines.append(f"{name}{_fmt_labels(labels)} {_fmt_value(value)}")
+    return "\n".join(lines) + "\n"
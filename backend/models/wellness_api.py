@@ -1,32 +1,37 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import json
+import os
 import random
-import re
+import sys
+
+# backend/ holds the intent matcher shared with chat_engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from intent_index import IntentIndex
 
 app = Flask(__name__)
 CORS(app)
 
+# Below this share of a pattern's weight we let the main chatbot answer
+MIN_CONFIDENCE = 0.5
+
 # Load wellness module
 with open('wellness_module.json', 'r', encoding='utf-8') as f:
     wellness_data = json.load(f)
 
+# Compiled once: token index + phrase automaton over every pattern
+wellness_index = IntentIndex(wellness_data['intents'])
+
 def match_wellness_intent(message):
-    """Simple pattern matching for wellness features"""
-    message_lower = message.lower()
-    
-    for intent in wellness_data['intents']:
-        for pattern in intent['patterns']:
-            # Convert pattern to regex (simple matching)
-            pattern_lower = pattern.lower()
-            if pattern_lower in message_lower or any(word in message_lower for word in pattern_lower.split()):
-                return {
-                    'tag': intent['tag'],
-                    'response': random.choice(intent['responses']),
-                    'confidence': 0.95
-                }
-    
-    return None
+    """Best scoring wellness intent, or None if nothing matches confidently"""
+    best = wellness_index.match(message, min_confidence=MIN_CONFIDENCE)
+    if not best:
+        return None
+    return {
+        'tag': best['tag'],
+        'response': random.choice(best['intent']['responses']),
+        'confidence': round(best['confidence'], 4)
+    }
 
 @app.route('/api/wellness', methods=['POST'])
 def wellness_chat():
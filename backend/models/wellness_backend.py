@@ -4,6 +4,7 @@ Runs on Port 5001
 """
 
 import os
+import sys
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'  # Suppress TensorFlow warnings
 
 from flask import Flask, request, jsonify
@@ -14,10 +15,13 @@ import json
 import random
 import nltk
 from nltk.stem import WordNetLemmatizer
-from tensorflow.keras.models import load_model
 import warnings
 warnings.filterwarnings('ignore')
 
+# backend/ holds the shared numpy_model runtime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy_model
+
 app = Flask(__name__)
 CORS(app)
 
@@ -27,14 +31,28 @@ lemmatizer = WordNetLemmatizer()
 # Load wellness model and data
 print("Loading wellness model...")
 try:
-    wellness_model = load_model('wellness_model.h5')
-    
-    # Fix for Windows encoding issues
-    with open('wellness_words.pkl', 'rb') as f:
-        wellness_words = pickle.load(f, encoding='latin1')
+    wellness_model = None
+    if os.path.exists('wellness_model.npz'):
+        # Exported weights + vocab (python ../numpy_model.py), no TensorFlow needed
+        try:
+            wellness_model = numpy_model.load('wellness_model.npz', source='wellness_model.h5')
+            wellness_words = wellness_model.words
+            wellness_classes = wellness_model.classes
+        except numpy_model.StaleExport as e:
+            print(f"⚠️ {e}; loading wellness_model.h5 instead")
+    if wellness_model is None:
+        from tensorflow.keras.models import load_model
+        wellness_model = load_model('wellness_model.h5')
+        
+        # Fix for Windows encoding issues
+        with open('wellness_words.pkl', 'rb') as f:
+            wellness_words = pickle.load(f, encoding='latin1')
+        
+        with open('wellness_classes.pkl', 'rb') as f:
+            wellness_classes = pickle.load(f, encoding='latin1')
     
-    with open('wellness_classes.pkl', 'rb') as f:
-        wellness_classes = pickle.load(f, encoding='latin1')
+    # word -> column in the bag-of-words vector
+    word_index = {word: i for i, word in enumerate(wellness_words)}
     
     with open('wellness_module.json', encoding='utf-8') as f:
         wellness_intents = json.load(f)
@@ -52,32 +70,40 @@ def clean_up_sentence(sentence):
     sentence_words = [lemmatizer.lemmatize(word.lower()) for word in sentence_words]
     return sentence_words
 
+ERROR_THRESHOLD = 0.20  # Lower threshold for wellness queries
+PREDICT_BATCH_SIZE = 512  # rows per model call when classifying many sentences
+MAX_BATCH_MESSAGES = 1000  # per /chat/batch request
+
+def bag_of_words_batch(sentences):
+    """Convert sentences to a (len(sentences), vocab) bag of words matrix"""
+    bags = np.zeros((len(sentences), len(wellness_words)), dtype=np.float32)
+    for row, sentence in enumerate(sentences):
+        cols = [word_index[w] for w in clean_up_sentence(sentence) if w in word_index]
+        bags[row, cols] = 1
+    return bags
+
 def bag_of_words(sentence):
     """Convert sentence to bag of words array"""
-    sentence_words = clean_up_sentence(sentence)
-    bag = [0] * len(wellness_words)
-    for w in sentence_words:
-        for i, word in enumerate(wellness_words):
-            if word == w:
-                bag[i] = 1
-    return np.array(bag)
+    return bag_of_words_batch([sentence])[0]
+
+def predict_wellness_classes(sentences):
+    """Predict the wellness intent classes for many sentences with batched model calls"""
+    bags = bag_of_words_batch(sentences)
+    results = []
+    for start in range(0, len(bags), PREDICT_BATCH_SIZE):
+        probs = np.asarray(wellness_model.predict_on_batch(bags[start:start + PREDICT_BATCH_SIZE]))
+        for res in probs:
+            hits = np.flatnonzero(res > ERROR_THRESHOLD)
+            hits = hits[np.argsort(-res[hits])]
+            results.append([
+                {'intent': wellness_classes[i], 'probability': str(res[i])}
+                for i in hits
+            ])
+    return results
 
 def predict_wellness_class(sentence):
     """Predict the wellness intent class"""
-    bow = bag_of_words(sentence)
-    res = wellness_model.predict(np.array([bow]))[0]
-    
-    ERROR_THRESHOLD = 0.20  # Lower threshold for wellness queries
-    results = [[i, r] for i, r in enumerate(res) if r > ERROR_THRESHOLD]
-    results.sort(key=lambda x: x[1], reverse=True)
-    
-    return_list = []
-    for r in results:
-        return_list.append({
-            'intent': wellness_classes[r[0]], 
-            'probability': str(r[1])
-        })
-    return return_list
+    return predict_wellness_classes([sentence])[0]
 
 def get_wellness_response(intents_list):
     """Get response from wellness intents"""
@@ -135,6 +161,33 @@ def wellness_chat():
         print(f"Error in wellness chat: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/chat/batch', methods=['POST'])
+def wellness_chat_batch():
+    """Classify a list of messages in one pass (e.g. re-tagging old journals)"""
+    try:
+        data = request.get_json() or {}
+        messages = data.get('messages')
+        
+        if not isinstance(messages, list) or not messages:
+            return jsonify({'error': 'No messages provided'}), 400
+        if len(messages) > MAX_BATCH_MESSAGES:
+            return jsonify({'error': f'At most {MAX_BATCH_MESSAGES} messages per batch'}), 400
+        
+        if wellness_model is None:
+            return jsonify({'error': 'Wellness model not loaded'}), 500
+        
+        results = []
+        for intents in predict_wellness_classes([str(m) for m in messages]):
+            result = get_wellness_response(intents)
+            if result:
+                result['source'] = 'wellness_model'
+            results.append(result)
+        return jsonify({'results': results})
+            
+    except Exception as e:
+        print(f"Error in wellness batch chat: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -0,0 +1,165 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np
+
+# TensorFlow-free runtime for the bag-of-words classifiers (chatbot_model.h5,
+# wellness_model.h5). Both are Sequential Dense/Dropout stacks, so inference is
+# a few matmuls. export() turns a Keras .h5 (read with h5py, no TF needed)
+# plus its words/classes pickles into one .npz that load() opens in milliseconds.
+
+FORMAT_VERSION = 1
+ACTIVATIONS = ("linear", "relu", "softmax")
+
+def _relu(x):
+    return np.maximum(x, 0)
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+class NumpyMLP:
+    """Dense/ReLU/softmax forward pass with the same predict API the Keras model had."""
+
+    def __init__(self, layers, words=None, classes=None):
+        # layers: [(kernel, bias, activation), ...]
+        self.layers = layers
+        self.words = list(words) if words is not None else []
+        self.classes = list(classes) if classes is not None else []
+        for (kernel, _, _), (nxt, _, _) in zip(layers, layers[1:]):
+            if kernel.shape[1] != nxt.shape[0]:
+                raise ValueError(f"Layer shapes don't chain: {kernel.shape} -> {nxt.shape}")
+
+    @property
+    def input_dim(self):
+        return self.layers[0][0].shape[0]
+
+    def predict_on_batch(self, x):
+        x = np.asarray(x, dtype=np.float32)
+        for kernel, bias, activation in self.layers:
+            x = x @ kernel + bias
+            if activation == "relu":
+                x = _relu(x)
+            elif activation == "softmax":
+                x = _softmax(x)
+        return x
+
+    def predict(self, x, batch_size=512, verbose=0):
+        x = np.asarray(x, dtype=np.float32)
+        if len(x) <= batch_size:
+            return self.predict_on_batch(x)
+        return np.concatenate([self.predict_on_batch(x[i:i + batch_size]) for i in range(0, len(x), batch_size)])
+
+class StaleExport(ValueError):
+    """The .npz was exported from a different .h5 than the one next to it."""
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load(path, source=None):
+    """Load an .npz written by export().
+
+    source is the .h5 it was exported from; if that file exists and no longer
+    matches the recorded source_sha256 (retrained without re-exporting),
+    StaleExport is raised so the caller can fall back to the .h5.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        if int(data["format_version"]) != FORMAT_VERSION:
+            raise ValueError(f"Unsupported model format {int(data['format_version'])} in {path}")
+        if source is not None and os.path.exists(source):
+            recorded = str(data["source_sha256"]) if "source_sha256" in data.files else None
+            if recorded != file_sha256(source):
+                raise StaleExport(f"{path} was not exported from the current {source} (re-run numpy_model.py)")
+        activations = [str(a) for a in data["activations"]]
+        layers = [
+            (data[f"kernel_{i}"].astype(np.float32), data[f"bias_{i}"].astype(np.float32), activation)
+            for i, activation in enumerate(activations)
+        ]
+        return NumpyMLP(layers, words=[str(w) for w in data["words"]], classes=[str(c) for c in data["classes"]])
+
+def read_h5_layers(h5_path):
+    """Dense layers of a Keras Sequential .h5 as [(kernel, bias, activation), ...]."""
+    import h5py
+
+    with h5py.File(h5_path, "r") as f:
+        config = f.attrs["model_config"]
+        config = json.loads(config.decode("utf-8") if isinstance(config, bytes) else config)
+        if config.get("class_name") != "Sequential":
+            raise ValueError(f"Only Sequential models are supported, got {config.get('class_name')}")
+        weights = f["model_weights"] if "model_weights" in f else f
+
+        layers = []
+        for layer in config["config"]["layers"]:
+            kind = layer["class_name"]
+            if kind in ("InputLayer", "Dropout"):
+                continue  # no-ops at inference time
+            if kind != "Dense":
+                raise ValueError(f"Unsupported layer type: {kind}")
+            activation = layer["config"].get("activation", "linear")
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation: {activation}")
+            group = weights[layer["config"]["name"]]
+            names = [n.decode("utf-8") if isinstance(n, bytes) else n for n in group.attrs["weight_names"]]
+            kernel = next(group[n][()] for n in names if "kernel" in n)
+            bias = next(group[n][()] for n in names if "bias" in n)
+            layers.append((kernel.astype(np.float32), bias.astype(np.float32), activation))
+    return layers
+
+def _load_pickle(path):
+    with open(path, "rb") as f:
+        return pickle.load(f, encoding="latin1")
+
+def export(h5_path, words_path, classes_path, out_path):
+    """Convert a Keras .h5 and its vocab/classes pickles into a single .npz."""
+    layers = read_h5_layers(h5_path)
+    words = _load_pickle(words_path)
+    classes = _load_pickle(classes_path)
+    if layers[0][0].shape[0] != len(words):
+        raise ValueError(f"Model expects {layers[0][0].shape[0]} inputs but vocab has {len(words)} words")
+    if layers[-1][0].shape[1] != len(classes):
+        raise ValueError(f"Model has {layers[-1][0].shape[1]} outputs but there are {len(classes)} classes")
+
+    source_sha256 = file_sha256(h5_path)
+
+    arrays = {
+        "format_version": np.array(FORMAT_VERSION),
+        "source_sha256": np.array(source_sha256),
+        "activations": np.array([activation for _, _, activation in layers]),
+        "words": np.array(words, dtype=str),
+        "classes": np.array(classes, dtype=str),
+    }
+    for i, (kernel, bias, _) in enumerate(layers):
+        arrays[f"kernel_{i}"] = kernel
+        arrays[f"bias_{i}"] = bias
+    np.savez_compressed(out_path, **arrays)
+    print(f"Exported {h5_path} -> {out_path} ({len(layers)} dense layers, {len(words)} words, {len(classes)} classes)")
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+
+# The two models shipped in backend/models
+BUNDLED = {
+    "wellness": ("wellness_model.h5", "wellness_words.pkl", "wellness_classes.pkl", "wellness_model.npz"),
+    "chatbot": ("chatbot_model.h5", "words.pkl", "classes.pkl", "chatbot_model.npz"),
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export Keras .h5 classifiers to NumPy .npz")
+    parser.add_argument("models", nargs="*", metavar="MODEL",
+                        help=f"bundled models to export: {', '.join(BUNDLED)} (default: all)")
+    args = parser.parse_args(argv)
+    for name in args.models:
+        if name not in BUNDLED:
+            parser.error(f"unknown model {name!r}")
+    for name in args.models or list(BUNDLED):
+        h5, words, classes, out = (os.path.join(MODELS_DIR, p) for p in BUNDLED[name])
+        export(h5, words, classes, out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import re
+
+from response_cache import TTLCache
+
+# Token budgeting for the Groq prompt. Token counts are a local approximation
+# (roughly one token per word piece of up to 4 characters, punctuation counted
+# separately), close enough to keep prompts inside a budget without shipping a
+# tokenizer. History is filled newest-first; turns that no longer fit are
+# folded into a short extractive summary that is cached per conversation
+# prefix, so each request only summarizes the turns that just fell out.
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1500"))
+MESSAGE_SHARE = 0.4  # the new user message may use at most this share of the budget
+TURN_TOKENS = 300  # a single history turn is cut to this before fitting
+SNIPPET_TOKENS = 120  # per KB grounding snippet
+JOURNAL_TOKENS = 150
+SUMMARY_TOKENS = 200
+SUMMARY_TURN_TOKENS = 30  # per summarized turn
+MESSAGE_OVERHEAD = 4  # role/separators per chat message
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+ELLIPSIS = " …"
+SUMMARY_SEPARATOR = " | "
+
+# prefix digest -> tuple of summary lines
+summary_cache = TTLCache(maxsize=int(os.getenv("PROMPT_SUMMARY_CACHE_SIZE", "1024")), ttl=3600)
+
+def _piece_tokens(piece):
+    return 1 + (len(piece) - 1) // 4
+
+def count_tokens(text):
+    """Approximate token count of text."""
+    if not text:
+        return 0
+    return sum(_piece_tokens(m) for m in _TOKEN_RE.findall(text))
+
+def message_tokens(content):
+    return count_tokens(content) + MESSAGE_OVERHEAD
+
+def truncate(text, max_tokens):
+    """First max_tokens (approx.) of text, with an ellipsis when something was cut."""
+    if max_tokens <= 0 or not text:
+        return ""
+    used = 0
+    for m in _TOKEN_RE.finditer(text):
+        used += _piece_tokens(m.group())
+        if used > max_tokens:
+            return text[:m.start()].rstrip() + ELLIPSIS
+    return text
+
+def truncate_middle(text, max_tokens):
+    """Keep the start and the end of text (a long message usually ends with the actual question)."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    head = truncate(text, max_tokens * 2 // 3)
+    tail_budget = max_tokens - count_tokens(head)
+    used = 0
+    start = len(text)
+    for m in reversed(list(_TOKEN_RE.finditer(text))):
+        used += _piece_tokens(m.group())
+        if used > tail_budget:
+            break
+        start = m.start()
+    return f"{head} {text[start:]}".rstrip()
+
+def _summary_line(turn):
+    role = "User" if turn.get('role') == 'user' else "You"
+    first = _SENTENCE_END_RE.split(str(turn.get('content', '')).strip(), 1)[0]
+    return f"{role}: {truncate(first, SUMMARY_TURN_TOKENS)}"
+
+def _add_line(lines, line):
+    # newest lines win once the summary is over SUMMARY_TOKENS
+    lines = lines + (line,)
+    while len(lines) > 1 and count_tokens(SUMMARY_SEPARATOR.join(lines)) > SUMMARY_TOKENS:
+        lines = lines[1:]
+    return lines
+
+def _prefix_digests(turns):
+    h = hashlib.sha1()
+    digests = []
+    for turn in turns:
+        h.update(f"{turn.get('role')}\x1f{turn.get('content')}\x1e".encode("utf-8"))
+        digests.append(h.hexdigest())
+    return digests
+
+def summarize(turns):
+    """Rolling summary of turns (oldest first), reusing the cached summary of the longest known prefix."""
+    if not turns:
+        return ""
+    digests = _prefix_digests(turns)
+    lines, start = (), 0
+    for i in range(len(digests) - 1, -1, -1):
+        cached = summary_cache.get(digests[i])
+        if cached is not None:
+            lines, start = cached, i + 1
+            break
+    for i in range(start, len(turns)):
+        lines = _add_line(lines, _summary_line(turns[i]))
+    if start < len(turns):
+        summary_cache.put(digests[-1], lines)
+    return SUMMARY_SEPARATOR.join(lines)
+
+def fit_history(history, budget, max_turns):
+    """Split history into (recent turns sent verbatim, summary of everything older) within budget tokens."""
+    history = history or []
+    kept = []  # newest first: (turn, cost)
+    used = 0
+    for turn in reversed(history[-max_turns:] if max_turns else []):
+        content = truncate(str(turn.get('content', '')), TURN_TOKENS)
+        cost = message_tokens(content)
+        if used + cost > budget:
+            break
+        kept.append(({"role": turn.get('role'), "content": content}, cost))
+        used += cost
+
+    summary = ""
+    while len(kept) < len(history):
+        summary = summarize(history[:len(history) - len(kept)])
+        if used + count_tokens(summary) <= budget or not kept:
+            break
+        # make room for the summary by folding the oldest kept turn into it
+        _, cost = kept.pop()
+        used -= cost
+    if summary and used + count_tokens(summary) > budget:
+        summary = truncate(summary, budget - used)
+
+    return [turn for turn, _ in reversed(kept)], summary
@@ -1,5 +1,7 @@
 # keywords that indicate someone might be in crisis
 # basic keyword matching - could be improved with NLP later
+from collections import deque, namedtuple
+
 CRISIS_KEYWORDS = [
     "suicide",
     "kill myself",
@@ -12,11 +14,109 @@ CRISIS_KEYWORDS = [
     "overdose",
 ]
 
+# where a keyword was found, offsets point into the original text
+CrisisMatch = namedtuple("CrisisMatch", ["keyword", "start", "end"])
+
+APOSTROPHES = "'’‘`"
+
+def normalize(text: str):
+    # lowercase, drop apostrophes ("can't" == "cant") and squash whitespace
+    # also returns the original index of every kept character
+    chars = []
+    offsets = []
+    last_space = True
+    for i, ch in enumerate(text):
+        if ch in APOSTROPHES:
+            continue
+        if ch.isspace():
+            if last_space:
+                continue
+            ch = " "
+            last_space = True
+        else:
+            ch = ch.lower()
+            last_space = False
+        chars.append(ch)
+        offsets.append(i)
+    return "".join(chars), offsets
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+class CrisisMatcher:
+    """Aho-Corasick automaton over all keywords, so a scan is one pass no matter how many keywords."""
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        # state -> {char: next state}, fail links and keyword outputs per state
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for keyword in self.keywords:
+            pattern, _ = normalize(keyword.strip())
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = nxt
+            self.output[state].append((keyword, len(pattern)))
+
+        # breadth first pass to fill in fail links
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def find(self, text: str):
+        """Return every keyword match in text, in order of appearance.
+
+        A match has to start at a word boundary but may run on into a longer
+        word, so "suicides", "overdosed" and "kill themselves" still count:
+        missing a crisis costs far more than a false alarm.
+        """
+        norm, offsets = normalize(text)
+        matches = []
+        state = 0
+        for i, ch in enumerate(norm):
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            for keyword, length in self.output[state]:
+                start = i - length + 1
+                if start > 0 and _is_word_char(norm[start - 1]):
+                    continue
+                matches.append(CrisisMatch(keyword, offsets[start], offsets[i] + 1))
+        matches.sort(key=lambda m: (m.start, -m.end))
+        return matches
+
+_matcher = CrisisMatcher(CRISIS_KEYWORDS)
+
+def find_crisis(text: str):
+    # /chat scans once and hands the verdict to chat_engine.predict, so
+    # nothing here needs to remember messages
+    return tuple(_matcher.find(text))
+
 def is_crisis(text: str) -> bool:
-    # check if text contains any crisis keywords
-    # convert to lowercase so it's case insensitive
-    lowered = text.lower()
-    return any(keyword in lowered for keyword in CRISIS_KEYWORDS)
+    # check if text contains any crisis keywords (case insensitive, starting at a word boundary)
+    return bool(find_crisis(text))
+
+def is_crisis_many(texts):
+    # bulk scan, e.g. for old journal entries
+    return [bool(_matcher.find(text)) for text in texts]
 
 def crisis_message() -> str:
     return (
@@ -26,4 +126,3 @@ def crisis_message() -> str:
         "🚨 **Emergency:** 112\n"
         "You don't have to face this alone, bro."
     )
-
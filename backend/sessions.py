@@ -0,0 +1,104 @@
+import datetime
+import os
+import secrets
+import threading
+import time
+
+import database
+from response_cache import TTLCache
+
+# Server-held chat history, so clients send only the new message plus a
+# session id. SQLite is the source of truth (shared by every worker); each
+# worker keeps recently used sessions in an LRU with a TTL and checks the
+# stored turn count before trusting its copy, loading only the turns it
+# hasn't seen when another worker appended in the meantime.
+#
+# Conversations are personal, so they don't outlive their use: a session
+# with no new turns for SESSION_EXPIRE_DAYS reads as gone (the client gets a
+# fresh one), and its rows are deleted at startup and then at most every
+# SESSION_PRUNE_SECS. SESSION_EXPIRE_DAYS=0 keeps sessions until deleted.
+
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "1000"))
+SESSION_TTL_SECS = float(os.getenv("SESSION_TTL_SECS", "1800"))
+SESSION_MAX_TURNS = 200  # turns kept in memory / loaded per session
+MAX_TURN_CHARS = 8000  # a stored turn is cut to this
+SESSION_EXPIRE_DAYS = float(os.getenv("SESSION_EXPIRE_DAYS", "30"))
+SESSION_PRUNE_SECS = float(os.getenv("SESSION_PRUNE_SECS", "3600"))
+
+# session id -> {"turns": [...], "length": turns stored in the DB}
+_cache = TTLCache(maxsize=SESSION_CACHE_SIZE, ttl=SESSION_TTL_SECS)
+_lock = threading.Lock()
+_last_prune = None  # time.monotonic() of the last prune in this worker
+
+def expiry_cutoff():
+    """Timestamp before which an idle session has expired, or None if sessions don't expire."""
+    if SESSION_EXPIRE_DAYS <= 0:
+        return None
+    return (datetime.datetime.now() - datetime.timedelta(days=SESSION_EXPIRE_DAYS)).isoformat()
+
+def prune(force=False):
+    """Delete expired sessions; returns how many (0 if expiry is off or this worker pruned recently)."""
+    global _last_prune
+    cutoff = expiry_cutoff()
+    if cutoff is None:
+        return 0
+    now = time.monotonic()
+    with _lock:
+        if not force and _last_prune is not None and now - _last_prune < SESSION_PRUNE_SECS:
+            return 0
+        _last_prune = now
+    return database.prune_sessions(cutoff)
+
+def create() -> str:
+    prune()
+    session_id = secrets.token_urlsafe(16)
+    database.create_session(session_id)
+    _cache.put(session_id, {"turns": [], "length": 0})
+    return session_id
+
+def get_history(session_id):
+    """Turns of a session (oldest first, at most SESSION_MAX_TURNS), or None if it doesn't exist or expired."""
+    length = database.get_session_length(session_id, active_since=expiry_cutoff())
+    if length is None:
+        return None
+    with _lock:
+        entry = _cache.get(session_id)
+        if entry is not None and entry["length"] == length:
+            return list(entry["turns"])
+        known = entry["length"] if entry is not None else None
+
+    if known is not None and known < length:
+        turns = entry["turns"] + database.get_session_turns(session_id, after=known)
+    else:
+        turns = database.get_session_turns(session_id, after=max(0, length - SESSION_MAX_TURNS))
+    turns = turns[-SESSION_MAX_TURNS:]
+    with _lock:
+        _cache.put(session_id, {"turns": turns, "length": length})
+    return list(turns)
+
+def append(session_id, turns):
+    """Store turns ({"role", "content"}) at the end of a session; False if it doesn't exist."""
+    turns = [
+        {"role": "user" if t.get("role") == "user" else "bot", "content": str(t.get("content", ""))[:MAX_TURN_CHARS]}
+        for t in turns
+    ]
+    if not turns:
+        return True
+    length = database.append_session_turns(session_id, turns)
+    if length is None:
+        return False
+    with _lock:
+        entry = _cache.get(session_id)
+        if entry is not None and entry["length"] == length - len(turns):
+            # our copy was current right before this write: extend it
+            _cache.put(session_id, {"turns": (entry["turns"] + turns)[-SESSION_MAX_TURNS:], "length": length})
+        else:
+            _cache.pop(session_id)  # reload on next read
+    return True
+
+def delete(session_id):
+    _cache.pop(session_id)
+    return database.delete_session(session_id)
+
+def stats():
+    return _cache.stats()
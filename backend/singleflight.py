@@ -0,0 +1,133 @@
+import os
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import metrics
+
+# Request coalescing ("single flight"): concurrent callers asking for the same
+# key share one in-flight call instead of each running it. The first caller
+# (the leader) runs it; everyone who arrives before it finishes waits on the
+# same Future and gets the same result, or the same exception. Waiters can
+# give up after a per-call timeout without affecting the others. A key of
+# None is never shared.
+
+SINGLEFLIGHT = os.getenv("SINGLEFLIGHT", "1") == "1"
+
+class Call:
+    """One in-flight call: its key, the Future every waiter shares, and how many are waiting."""
+
+    __slots__ = ("key", "future", "waiters", "task")
+
+    def __init__(self, key):
+        self.key = key
+        self.future = Future()
+        self.waiters = 1
+        self.task = None  # executor future when started with start()
+
+class Group:
+    """Coalesces concurrent calls by key; results are shared, so callers must not mutate them."""
+
+    def __init__(self, name, timeout=None):
+        self.name = name
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.shared = 0
+        self.timeouts = 0
+
+    def claim(self, key):
+        """(call, leader). The leader must settle the call with finish()."""
+        if key is None or not SINGLEFLIGHT:
+            return Call(None), True
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                self._calls[key] = call = Call(key)
+                self.leaders += 1
+                return call, True
+            call.waiters += 1
+            self.shared += 1
+        metrics.inc("mhc_singleflight_shared_total", help="Calls that joined an identical in-flight call", group=self.name)
+        return call, False
+
+    def finish(self, call, result=None, error=None):
+        with self._lock:
+            if self._calls.get(call.key) is call:
+                del self._calls[call.key]
+        if call.future.done():
+            return  # cancelled by abandon()
+        if error is not None:
+            call.future.set_exception(error)
+        else:
+            call.future.set_result(result)
+
+    def wait(self, call, timeout=None):
+        """Result of a shared call; concurrent.futures.TimeoutError after timeout (the call carries on, see abandon())."""
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return call.future.result(timeout=timeout)
+        except FutureTimeout:
+            self.timed_out()
+            raise
+
+    def timed_out(self):
+        self.timeouts += 1
+        metrics.inc("mhc_singleflight_timeouts_total", help="Waiters that gave up on a shared call", group=self.name)
+
+    def do(self, key, fn, *args, timeout=None):
+        """fn(*args), shared with concurrent callers using the same key."""
+        call, leader = self.claim(key)
+        if not leader:
+            try:
+                return self.wait(call, timeout)
+            except FutureTimeout:
+                self.abandon(call)
+                raise
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            self.finish(call, error=e)
+            raise
+        self.finish(call, result=result)
+        return result
+
+    def submit(self, key, executor, fn, *args):
+        """(call, leader) for fn(*args) run on executor, or the identical call already in flight."""
+        call, leader = self.claim(key)
+        if leader:
+            self.start(call, executor, fn, *args)
+        return call, leader
+
+    def start(self, call, executor, fn, *args):
+        """Run a claimed call's fn(*args) on executor and settle it with the outcome."""
+        def run():
+            try:
+                result = fn(*args)
+            except BaseException as e:
+                self.finish(call, error=e)
+                return
+            self.finish(call, result=result)
+
+        call.task = executor.submit(run)
+
+    def abandon(self, call):
+        """A waiter stops waiting. True if nobody is left and the call was cancelled before it started."""
+        with self._lock:
+            call.waiters -= 1
+            if call.waiters > 0 or call.task is None or not call.task.cancel():
+                return False
+            if self._calls.get(call.key) is call:
+                del self._calls[call.key]
+        call.future.cancel()
+        return True
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._calls)
+        return {
+            "in_flight": in_flight,
+            "leaders": self.leaders,
+            "shared": self.shared,
+            "timeouts": self.timeouts,
+        }
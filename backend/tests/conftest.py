@@ -0,0 +1,54 @@
+import os
+import sys
+
+# backend modules import each other flat (`import chat_engine`), as they do
+# when the app runs from the backend folder
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+import socket
+import threading
+import time
+
+import pytest
+
+@pytest.fixture(scope="session")
+def fake_groq_url():
+    """Base URL of fake_groq.app served by uvicorn on a background thread."""
+    import uvicorn
+    import fake_groq
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(fake_groq.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("fake Groq server did not start")
+        time.sleep(0.01)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join(timeout=5)
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """database pointed at a fresh, initialised file under tmp_path."""
+    import database
+
+    monkeypatch.setattr(database, "DB_NAME", str(tmp_path / "test.db"))
+    database.init_db()
+    yield database
+    database.close_all()
+
+@pytest.fixture
+def api(db):
+    """TestClient for main.app on the fresh database from the db fixture."""
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
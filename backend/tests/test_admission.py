@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+import admission
+from admission import FairLimiter, Rejected
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_admits_up_to_limit_then_rejects_when_queue_full():
+    async def scenario():
+        limiter = FairLimiter(2, 1, 1, 1)
+        await limiter.acquire("a")
+        await limiter.acquire("b")
+        waiter = asyncio.ensure_future(limiter.acquire("c"))
+        await asyncio.sleep(0)
+        assert limiter.stats()["queued"] == 1
+        with pytest.raises(Rejected) as e:
+            await limiter.acquire("d")
+        assert e.value.reason == admission.QUEUE_FULL
+        limiter.release()
+        await waiter
+        assert limiter.active == 2 and limiter.queued == 0
+        limiter.release()
+        limiter.release()
+        assert limiter.active == 0
+    run(scenario())
+
+def test_per_client_queue_cap():
+    async def scenario():
+        limiter = FairLimiter(1, 10, 1, 1)
+        await limiter.acquire("a")
+        waiter = asyncio.ensure_future(limiter.acquire("a"))
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as e:
+            await limiter.acquire("a")
+        assert e.value.reason == admission.CLIENT_QUEUE_FULL
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert limiter.queued == 0
+    run(scenario())
+
+def test_queue_timeout():
+    async def scenario():
+        limiter = FairLimiter(1, 10, 10, 0.05)
+        await limiter.acquire("a")
+        with pytest.raises(Rejected) as e:
+            await limiter.acquire("b")
+        assert e.value.reason == admission.TIMEOUT
+        assert e.value.retry_after == 1
+        assert limiter.queued == 0 and limiter.active == 1
+    run(scenario())
+
+def test_round_robin_across_clients():
+    async def scenario():
+        limiter = FairLimiter(1, 10, 10, 5)
+        await limiter.acquire("busy")
+        order = []
+
+        async def turn(client):
+            await limiter.acquire(client)
+            order.append(client)
+            limiter.release()
+
+        tasks = [asyncio.ensure_future(turn(c)) for c in ("busy", "busy", "busy", "other")]
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*tasks)
+        assert order == ["busy", "other", "busy", "busy"]
+        assert limiter.active == 0
+    run(scenario())
+
+def test_unlimited_stays_balanced():
+    async def scenario():
+        limiter = FairLimiter(0, 0, 0, 1)
+        for _ in range(3):
+            await limiter.acquire("a")
+        for _ in range(3):
+            limiter.release()
+        assert limiter.active == 0
+    run(scenario())
+
+def test_slot_releases_once():
+    async def scenario():
+        limiter = FairLimiter(1, 1, 1, 1)
+        await limiter.acquire("a")
+        slot = admission.Slot(limiter)
+        slot.release()
+        slot.release()
+        assert limiter.active == 0
+    run(scenario())
+
+def test_slot_released_when_body_never_iterated():
+    import gc
+
+    async def scenario():
+        limiter = FairLimiter(1, 1, 1, 1)
+        await limiter.acquire("a")
+        slot = admission.Slot(limiter)
+
+        async def body():
+            try:
+                yield b""
+            finally:
+                slot.release()
+
+        gen = body()
+        slot.release_when_dropped(gen)
+        del gen
+        gc.collect()
+        await asyncio.sleep(0)
+        assert limiter.active == 0
+    run(scenario())
+
+class FakeRequest:
+    def __init__(self, forwarded=None, host="10.0.0.1"):
+        self.headers = {"x-forwarded-for": forwarded} if forwarded is not None else {}
+        self.client = type("Client", (), {"host": host})()
+
+def test_client_key_ignores_forwarded_for_without_trusted_proxies():
+    assert admission.client_key(FakeRequest("1.2.3.4"), trusted_hops=0) == "10.0.0.1"
+
+def test_client_key_uses_hop_added_by_trusted_proxy():
+    # the client wrote "spoofed"; the one trusted proxy appended the real address
+    assert admission.client_key(FakeRequest("spoofed, 203.0.113.7"), trusted_hops=1) == "203.0.113.7"
+    assert admission.client_key(FakeRequest("spoofed, 203.0.113.7, 10.1.1.1"), trusted_hops=2) == "203.0.113.7"
+    assert admission.client_key(FakeRequest("203.0.113.7"), trusted_hops=3) == "203.0.113.7"
+    assert admission.client_key(FakeRequest(" , "), trusted_hops=1) == "10.0.0.1"
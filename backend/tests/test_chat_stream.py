@@ -0,0 +1,76 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+from groq import Groq, AsyncGroq
+
+import chat_engine
+import database
+import fake_groq
+import main
+from circuit_breaker import CircuitBreaker
+
+@pytest.fixture
+def fake(fake_groq_url):
+    config = dict(fake_groq.CONFIG)
+    fake_groq.CONFIG.update(latency_ms=0, latency_dist="fixed", token_ms=0, tokens=8, error_rate=0, stream_error_rate=0)
+    yield fake_groq
+    fake_groq.CONFIG.clear()
+    fake_groq.CONFIG.update(config)
+
+@pytest.fixture
+def client(fake, fake_groq_url, tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_NAME", str(tmp_path / "test.db"))
+    monkeypatch.setattr(chat_engine, "client", Groq(api_key="fake", base_url=fake_groq_url, max_retries=0))
+    monkeypatch.setattr(chat_engine, "async_client", AsyncGroq(api_key="fake", base_url=fake_groq_url, max_retries=0))
+    monkeypatch.setattr(chat_engine, "upstream_pool", ThreadPoolExecutor(max_workers=4))
+    monkeypatch.setattr(chat_engine, "breaker", CircuitBreaker(5, 30))
+    chat_engine.response_cache.clear()
+    with TestClient(main.app) as c:
+        yield c
+    chat_engine.upstream_pool.shutdown()
+
+def stream_events(client, message):
+    """(event, data) pairs of a /chat/stream reply."""
+    with client.stream("POST", "/chat/stream", json={"message": message}) as res:
+        assert res.status_code == 200
+        body = "".join(res.iter_text())
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n", 1)
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+def test_stream_tokens(client, fake):
+    streamed = fake._stats["streamed"]
+    events = stream_events(client, "I had a long day at work")
+    kinds = [e for e, _ in events]
+    assert kinds[-1] == "done"
+    assert set(kinds[:-1]) == {"token"}
+    reply = "".join(d["text"] for e, d in events if e == "token")
+    assert reply.split() and reply.split()[0] in " ".join(fake.REPLY_LINES)
+    assert events[-1][1]["crisis"] is False
+    assert events[-1][1]["session_id"]
+    assert fake._stats["streamed"] == streamed + 1
+    assert main.admission.limiter.active == 0
+
+def test_stream_failure_replaces_partial_reply(client, fake):
+    fake.CONFIG["stream_error_rate"] = 1
+    events = stream_events(client, "nothing feels right lately")
+    kinds = [e for e, _ in events]
+    assert kinds[0] == "token"  # the fake always sends at least one token before failing
+    assert "replace" in kinds
+    assert kinds[-1] == "done"
+    replacement = [d["text"] for e, d in events if e == "replace"][-1]
+    assert replacement and replacement not in fake.REPLY_LINES
+    assert chat_engine.breaker.stats()["consecutive_failures"] == 1
+    assert main.admission.limiter.active == 0
+
+def test_stream_crisis_skips_upstream(client, fake):
+    requests = fake._stats["requests"]
+    events = stream_events(client, "I want to end it all")
+    assert [e for e, _ in events] == ["token", "done"]
+    assert events[0][1]["text"] == chat_engine.crisis_message()
+    assert events[-1][1]["crisis"] is True
+    assert fake._stats["requests"] == requests
@@ -0,0 +1,64 @@
+import circuit_breaker
+from circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+def make(monkeypatch, failures=3, reset=10.0):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock.monotonic)
+    return CircuitBreaker(failures, reset), clock
+
+def test_opens_after_consecutive_failures(monkeypatch):
+    breaker, _ = make(monkeypatch)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # resets the run
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["opens"] == 1
+    assert breaker.stats()["rejected"] == 1
+
+def test_half_open_lets_one_trial_through(monkeypatch):
+    breaker, clock = make(monkeypatch, failures=1)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # trial already running
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+def test_failed_trial_reopens(monkeypatch):
+    breaker, clock = make(monkeypatch, failures=1)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    clock.now += 5
+    assert not breaker.allow()
+    assert breaker.stats()["opens"] == 2
+
+def test_release_gives_back_trial_slot(monkeypatch):
+    breaker, clock = make(monkeypatch, failures=1)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+
+def test_zero_threshold_disables(monkeypatch):
+    breaker, _ = make(monkeypatch, failures=0)
+    for _ in range(10):
+        breaker.record_failure()
+    assert breaker.allow()
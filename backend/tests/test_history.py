@@ -0,0 +1,57 @@
+def seed(db):
+    # ties on purpose: moods and journals sharing timestamps, and same-type ties
+    moods = [(v, f"m{v}", ts) for v, ts in [
+        (1, "2024-01-01T10:00:00"), (2, "2024-01-02T10:00:00"), (3, "2024-01-02T10:00:00"),
+        (4, "2024-01-03T10:00:00"), (5, "2024-01-04T10:00:00"),
+    ]]
+    journals = [(f"j{i}", ts) for i, ts in enumerate([
+        "2024-01-02T10:00:00", "2024-01-02T10:00:00", "2024-01-03T10:00:00", "2024-01-05T10:00:00",
+    ])]
+    db.save_batch(moods, journals)
+
+def key(item):
+    return (item["type"], item["id"])
+
+def walk(api, limit, **params):
+    pages = []
+    cursor = None
+    while True:
+        query = dict(params, limit=limit, **({"before": cursor} if cursor else {}))
+        res = api.get("/history", params=query)
+        assert res.status_code == 200
+        pages.append(res.json())
+        cursor = res.headers.get("x-next-cursor")
+        if cursor is None:
+            return pages
+        assert len(pages) < 20
+
+def test_pages_cover_everything_once_in_order(db, api):
+    seed(db)
+    full = api.get("/history", params={"limit": 100}).json()
+    assert len(full) == 9
+    order = [(i["date"], i["type"], i["id"]) for i in full]
+    assert order == sorted(order, reverse=True)
+    for limit in (1, 2, 3, 4, 9):
+        pages = walk(api, limit)
+        items = [i for page in pages for i in page]
+        assert [key(i) for i in items] == [key(i) for i in full]
+        assert all(len(page) == limit for page in pages[:-1])
+
+def test_last_page_has_no_cursor(db, api):
+    seed(db)
+    res = api.get("/history", params={"limit": 5, "before": "2024-01-02T10:00:00|mood|2"})
+    items = res.json()
+    assert [i["date"] for i in items] == ["2024-01-02T10:00:00", "2024-01-02T10:00:00", "2024-01-01T10:00:00"]
+    assert "x-next-cursor" not in res.headers
+
+def test_filters(db, api):
+    seed(db)
+    moods = [i for page in walk(api, 2, type="mood") for i in page]
+    assert [i["val"] for i in moods] == [5, 4, 3, 2, 1]
+    ranged = api.get("/history", params={"since": "2024-01-02", "until": "2024-01-03"}).json()
+    assert {i["date"] for i in ranged} == {"2024-01-02T10:00:00"} and len(ranged) == 4
+
+def test_bad_parameters_are_400(db, api):
+    assert api.get("/history", params={"type": "sleep"}).status_code == 400
+    assert api.get("/history", params={"before": "garbage"}).status_code == 400
+    assert api.get("/history", params={"before": "2024-01-01|sleep|1"}).status_code == 400
@@ -0,0 +1,33 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import database
+import main
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_NAME", str(tmp_path / "test.db"))
+    with TestClient(main.app) as c:
+        for i in range(40):
+            c.post("/journal?durable=true", json={"entry": f"a journal entry long enough to fill a page {i}"})
+        yield c
+
+def test_etag_is_per_encoding(client):
+    gz = client.get("/history", headers={"accept-encoding": "gzip"})
+    plain = client.get("/history", headers={"accept-encoding": "identity"})
+    assert gz.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in plain.headers
+    assert gz.headers["etag"] != plain.headers["etag"]
+
+    def revalidate(encoding, etag):
+        return client.get("/history", headers={"accept-encoding": encoding, "if-none-match": etag}).status_code
+
+    assert revalidate("gzip", gz.headers["etag"]) == 304
+    assert revalidate("identity", plain.headers["etag"]) == 304
+    assert revalidate("identity", gz.headers["etag"]) == 200
+    assert revalidate("gzip", plain.headers["etag"]) == 200
+
+def test_write_changes_etag(client):
+    etag = client.get("/history").headers["etag"]
+    client.post("/mood?durable=true", json={"mood": 4})
+    assert client.get("/history", headers={"if-none-match": etag}).status_code == 200
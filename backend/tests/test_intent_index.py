@@ -0,0 +1,53 @@
+import json
+import os
+
+import pytest
+
+from intent_index import IntentIndex, STOP_WORDS, content_tokens, tokenize
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+MIN_CONFIDENCE = 0.5  # models/wellness_api.py
+
+@pytest.fixture(scope="module")
+def wellness_index():
+    with open(os.path.join(MODELS_DIR, "wellness_module.json"), encoding="utf-8") as f:
+        return IntentIndex(json.load(f)["intents"])
+
+@pytest.mark.parametrize("message", ["I am", "I feel", "the", "you and me"])
+def test_stop_words_alone_match_nothing(wellness_index, message):
+    assert wellness_index.match(message, min_confidence=MIN_CONFIDENCE) is None
+
+@pytest.mark.parametrize("message, tag", [
+    ("yoga", "yoga_request"),
+    ("I need yoga", "yoga_request"),
+    ("breathing exercise", "breathing_exercise"),
+    ("I want to do yoga", "yoga_request"),
+    ("I can't sleep", "sleep_support"),
+])
+def test_content_words_decide(wellness_index, message, tag):
+    best = wellness_index.match(message, min_confidence=MIN_CONFIDENCE)
+    assert best is not None and best["tag"] == tag
+
+def test_stop_words_do_not_add_confidence(wellness_index):
+    plain = wellness_index.match("yoga")
+    padded = wellness_index.match("I am so into the yoga")
+    assert padded["tag"] == plain["tag"]
+    assert padded["confidence"] == pytest.approx(plain["confidence"])
+
+def test_stop_word_only_pattern_matches_verbatim():
+    index = IntentIndex([
+        {"tag": "identity", "patterns": ["how are you"]},
+        {"tag": "sleep", "patterns": ["I can't sleep"]},
+    ])
+    best = index.match("hey how are you doing today")
+    assert best["tag"] == "identity" and best["phrase"]
+
+def test_content_tokens():
+    assert content_tokens(tokenize("I am feeling the stress")) == ["feeling", "stress"]
+    assert content_tokens(tokenize("how are you")) == ["how", "are", "you"]
+    assert "i" in STOP_WORDS
+
+def test_state_round_trip(wellness_index):
+    rebuilt = IntentIndex.from_state(wellness_index.intents, wellness_index.to_state())
+    for message in ("yoga", "breathing exercise", "I feel sad"):
+        assert rebuilt.score(message) == wellness_index.score(message)
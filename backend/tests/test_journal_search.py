@@ -0,0 +1,56 @@
+import pytest
+
+def seed(db):
+    db.save_batch([], [
+        ("Went running by the river, felt calm afterwards", "2024-02-01T08:00:00"),
+        ("Exam stress again, could not sleep", "2024-02-02T08:00:00"),
+        ("Calm evening, good sleep", "2024-02-03T08:00:00"),
+        ("Called my sister about the exams", "2024-02-04T08:00:00"),
+    ])
+
+def texts(items):
+    return [i["text"] for i in items]
+
+def test_search_ranks_stems_and_highlights(db):
+    seed(db)
+    assert db.has_fts()
+    items = db.search_journals("run")
+    assert texts(items) == ["Went running by the river, felt calm afterwards"]
+    assert "**running**" in items[0]["snippet"]
+    assert set(texts(db.search_journals("exam"))) == {"Exam stress again, could not sleep", "Called my sister about the exams"}
+    assert texts(db.search_journals("calm sleep")) == ["Calm evening, good sleep"]
+    assert len(db.search_journals("calm sleep", any_term=True)) == 3
+    assert texts(db.search_journals("sis")) == ["Called my sister about the exams"]  # last word is a prefix
+
+def test_index_follows_updates_and_deletes(db):
+    seed(db)
+    conn = db.get_connection()
+    with conn:
+        conn.execute("UPDATE journals SET entry = 'Went swimming instead' WHERE entry LIKE 'Went running%'")
+        conn.execute("DELETE FROM journals WHERE entry LIKE 'Called my sister%'")
+    assert db.search_journals("running") == []
+    assert texts(db.search_journals("swimming")) == ["Went swimming instead"]
+    assert texts(db.search_journals("exam")) == ["Exam stress again, could not sleep"]
+
+def test_query_syntax_is_not_interpreted(db):
+    seed(db)
+    # FTS5 operators and quotes in user input are searched as plain words
+    assert texts(db.search_journals('calm" OR "exam')) == []
+    assert texts(db.search_journals("NEAR(calm")) == []
+    with pytest.raises(ValueError):
+        db.search_journals("?!*")
+
+def test_endpoint_pages_and_rejects_bad_queries(db, api):
+    seed(db)
+    res = api.get("/journals/search", params={"q": "calm OR sleep OR exam", "limit": 2})
+    # plain words: all of calm, or, sleep, exam must match
+    assert res.status_code == 200 and res.json() == []
+
+    first = api.get("/journals/search", params={"q": "e", "limit": 2})
+    assert first.status_code == 200 and len(first.json()) == 2
+    cursor = first.headers["x-next-cursor"]
+    second = api.get("/journals/search", params={"q": "e", "limit": 2, "cursor": cursor})
+    assert {i["id"] for i in first.json()}.isdisjoint(i["id"] for i in second.json())
+
+    assert api.get("/journals/search", params={"q": "***"}).status_code == 400
+    assert api.get("/journals/search", params={"q": "calm", "cursor": "abc"}).status_code == 400
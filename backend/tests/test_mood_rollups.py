@@ -0,0 +1,59 @@
+import database
+
+def rollups(db):
+    rows = db.get_connection().execute("SELECT * FROM mood_rollups ORDER BY period, bucket").fetchall()
+    return [tuple(row) for row in rows]
+
+def assert_matches_rebuild(db):
+    incremental = rollups(db)
+    db.rebuild_mood_rollups()
+    assert rollups(db) == incremental
+
+def test_triggers_match_rebuild(db):
+    db.save_batch([
+        (1, "", "2024-01-01T09:00:00"),
+        (4, "", "2024-01-01T21:00:00"),
+        (5, "", "2024-01-08T10:00:00"),
+        (2, "", "2024-02-29T10:00:00"),
+    ], [])
+    assert_matches_rebuild(db)
+
+    conn = db.get_connection()
+    with conn:
+        conn.execute("UPDATE moods SET mood_value = 3 WHERE timestamp = '2024-01-01T09:00:00'")
+        conn.execute("UPDATE moods SET timestamp = '2024-03-01T10:00:00' WHERE timestamp = '2024-02-29T10:00:00'")
+    assert_matches_rebuild(db)
+
+    with conn:
+        conn.execute("DELETE FROM moods WHERE timestamp = '2024-01-08T10:00:00'")
+    assert_matches_rebuild(db)
+
+    day = {t["bucket"]: t for t in db.get_mood_trends("day", since="2024-01-01")}
+    assert day["2024-01-01"]["count"] == 2
+    assert day["2024-01-01"]["min"] == 3 and day["2024-01-01"]["max"] == 4
+    assert "2024-01-08" not in day and "2024-02-29" not in day
+    month = {t["bucket"]: t for t in db.get_mood_trends("month", since="2024-01-01")}
+    assert month["2024-01"]["count"] == 2 and month["2024-03"]["count"] == 1
+
+def test_unparseable_timestamp_is_left_out_of_rollups(db):
+    # date() is NULL for these; the rollup bucket is NOT NULL
+    added = db.import_batch([(3, "", "not a date"), (4, "", "2024-13-45"), (2, "", "2024-05-01T08:00:00")], [])
+    assert added == (3, 0)
+    assert [t["bucket"] for t in db.get_mood_trends("week")] == ["2024-04-29"]
+    assert_matches_rebuild(db)
+
+    conn = db.get_connection()
+    with conn:
+        conn.execute("UPDATE moods SET timestamp = '2024-05-02T08:00:00' WHERE timestamp = 'not a date'")
+        conn.execute("DELETE FROM moods WHERE timestamp = '2024-13-45'")
+    assert_matches_rebuild(db)
+    assert db.get_mood_trends("day", since="2024-05-01")[1]["count"] == 1
+
+def test_init_db_replaces_old_triggers(db):
+    conn = db.get_connection()
+    with conn:
+        conn.execute("DROP TRIGGER moods_rollup_insert")
+        conn.execute("CREATE TRIGGER moods_rollup_insert AFTER INSERT ON moods BEGIN SELECT 1; END")
+    database.init_db()
+    db.save_mood(3, "", "2024-06-01T12:00:00")
+    assert db.get_mood_trends("day")[-1]["bucket"] == "2024-06-01"
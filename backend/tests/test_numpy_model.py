@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+import numpy_model
+
+def write_export(tmp_path, source_bytes):
+    source = tmp_path / "model.h5"
+    source.write_bytes(source_bytes)
+    out = tmp_path / "model.npz"
+    np.savez(
+        out,
+        format_version=np.array(numpy_model.FORMAT_VERSION),
+        source_sha256=np.array(numpy_model.file_sha256(source)),
+        activations=np.array(["softmax"]),
+        words=np.array(["calm", "sad"]),
+        classes=np.array(["a", "b", "c"]),
+        kernel_0=np.ones((2, 3), dtype=np.float32),
+        bias_0=np.zeros(3, dtype=np.float32),
+    )
+    return out, source
+
+def test_load_checks_source(tmp_path):
+    out, source = write_export(tmp_path, b"weights v1")
+    model = numpy_model.load(out, source=source)
+    assert model.words == ["calm", "sad"]
+    assert model.predict([[1, 0]]).shape == (1, 3)
+
+    source.write_bytes(b"weights v2")
+    with pytest.raises(numpy_model.StaleExport):
+        numpy_model.load(out, source=source)
+    numpy_model.load(out)  # unchecked without a source
+
+def test_missing_source_is_not_stale(tmp_path):
+    out, source = write_export(tmp_path, b"weights v1")
+    source.unlink()
+    assert numpy_model.load(out, source=source).classes == ["a", "b", "c"]
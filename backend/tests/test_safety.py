@@ -0,0 +1,46 @@
+import pytest
+
+from safety import CrisisMatcher, CRISIS_KEYWORDS, find_crisis, is_crisis, is_crisis_many
+
+@pytest.mark.parametrize("text", [
+    "I want to kill myself",
+    "I'm thinking about SUICIDE",
+    "thinking about suicides",
+    "he overdoses every weekend",
+    "I overdosed last year",
+    "commit suicide2",
+    "I just want to end it all",
+    "I cant go on like this",
+    "I can’t go on",
+    "sometimes I want to kill themselves all",
+])
+def test_crisis_detected(text):
+    assert is_crisis(text)
+
+@pytest.mark.parametrize("text", [
+    "I had a great day",
+    "my friend's presuicide course",  # keyword must start a word
+    "the weekend it was fine",
+])
+def test_no_crisis(text):
+    assert not is_crisis(text)
+
+def test_recall_matches_baseline_substring_check():
+    # anything the original `keyword in text.lower()` caught at a word start must still be caught
+    texts = ["Suicides are rising", "overdoses", "I want to hurt myselfff", "kill them all", "harm myself!"]
+    for text in texts:
+        baseline = any(k in text.lower() for k in CRISIS_KEYWORDS)
+        assert baseline and is_crisis(text), text
+
+def test_match_offsets_point_into_original_text():
+    text = "Honestly  I  CAN'T go on"
+    (match,) = find_crisis(text)
+    assert match.keyword == "can't go on"
+    assert text[match.start:match.end] == "CAN'T go on"
+
+def test_is_crisis_many():
+    assert is_crisis_many(["fine", "suicides", ""]) == [False, True, False]
+
+def test_matcher_custom_keywords():
+    matcher = CrisisMatcher(["he", "she", "hers"])
+    assert [m.keyword for m in matcher.find("ushers hers")] == ["hers", "he"]
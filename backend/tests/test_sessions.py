@@ -0,0 +1,65 @@
+import sessions
+
+def turn(role, content):
+    return {"role": role, "content": content}
+
+def test_create_append_fetch(db):
+    sid = sessions.create()
+    assert sessions.get_history(sid) == []
+    assert sessions.append(sid, [turn("user", "hi"), turn("assistant", "hello")])
+    assert sessions.get_history(sid) == [turn("user", "hi"), turn("bot", "hello")]
+    assert db.get_session_length(sid) == 2
+
+def test_sees_turns_appended_by_another_worker(db):
+    sid = sessions.create()
+    sessions.append(sid, [turn("user", "one")])
+    assert len(sessions.get_history(sid)) == 1
+    # another worker writes straight to the DB; our cached copy is now short
+    db.append_session_turns(sid, [turn("bot", "two"), turn("user", "three")])
+    assert [t["content"] for t in sessions.get_history(sid)] == ["one", "two", "three"]
+
+def test_unknown_and_deleted_sessions(db):
+    assert sessions.get_history("nope") is None
+    assert not sessions.append("nope", [turn("user", "hi")])
+    sid = sessions.create()
+    sessions.append(sid, [turn("user", "hi")])
+    assert sessions.delete(sid)
+    assert sessions.get_history(sid) is None
+    assert not db.get_connection().execute("SELECT 1 FROM chat_turns WHERE session_id = ?", (sid,)).fetchone()
+
+def test_chat_keeps_conversation_server_side(api, monkeypatch):
+    import chat_engine
+    monkeypatch.setattr(chat_engine, "client", None)  # local engine, no network
+
+    first = api.post("/chat", json={"message": "I feel stressed about exams"}).json()
+    sid = first["session_id"]
+    assert sid
+    second = api.post("/chat", json={"message": "thanks", "session_id": sid}).json()
+    assert second["session_id"] == sid
+    turns = api.get(f"/sessions/{sid}").json()["turns"]
+    assert [t["content"] for t in turns] == ["I feel stressed about exams", first["reply"], "thanks", second["reply"]]
+
+    assert api.delete(f"/sessions/{sid}").status_code == 200
+    assert api.get(f"/sessions/{sid}").status_code == 404
+    # a gone session starts a new one instead of failing
+    third = api.post("/chat", json={"message": "hello again", "session_id": sid}).json()
+    assert third["session_id"] != sid
+
+def test_idle_sessions_expire_and_are_pruned(db, monkeypatch):
+    monkeypatch.setattr(sessions, "SESSION_EXPIRE_DAYS", 30)
+    db.create_session("old", ts="2000-01-01T00:00:00")
+    db.append_session_turns("old", [turn("user", "long ago")], ts="2000-01-02T00:00:00")
+    recent = sessions.create()
+    sessions.append(recent, [turn("user", "today")])
+
+    assert sessions.get_history("old") is None  # expired before it is pruned
+    assert sessions.prune(force=True) == 1
+    assert db.get_connection().execute("SELECT COUNT(*) FROM chat_turns WHERE session_id = 'old'").fetchone()[0] == 0
+    assert sessions.get_history(recent) == [turn("user", "today")]
+    assert sessions.prune() == 0  # pruned recently
+
+def test_expiry_can_be_turned_off(db, monkeypatch):
+    monkeypatch.setattr(sessions, "SESSION_EXPIRE_DAYS", 0)
+    db.create_session("old", ts="2000-01-01T00:00:00")
+    assert sessions.get_history("old") == []
+    assert sessions.prune(force=True) == 0
@@ -0,0 +1,77 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import pytest
+
+import singleflight
+from singleflight import Group
+
+def test_concurrent_callers_share_one_call():
+    group = Group("test")
+    calls = []
+    gate = threading.Event()
+
+    def slow(x):
+        calls.append(x)
+        gate.wait(5)
+        return x * 2
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(group.do, "k", slow, 21) for _ in range(4)]
+        deadline = time.monotonic() + 5
+        while group.stats()["shared"] < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        gate.set()
+        results = [f.result(timeout=5) for f in futures]
+    assert results == [42] * 4
+    assert calls == [21]
+    assert group.stats() == {"in_flight": 0, "leaders": 1, "shared": 3, "timeouts": 0}
+
+def test_errors_are_shared():
+    group = Group("test")
+    call, leader = group.claim("k")
+    follower, joined_leader = group.claim("k")
+    assert leader and not joined_leader and follower is call
+    group.finish(call, error=ValueError("boom"))
+    with pytest.raises(ValueError):
+        group.wait(follower, 1)
+
+def test_none_key_is_never_shared():
+    group = Group("test")
+    a, _ = group.claim(None)
+    b, leader = group.claim(None)
+    assert leader and a is not b
+
+def test_waiter_times_out_without_cancelling_started_call():
+    group = Group("test")
+    gate = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        call, leader = group.submit("k", pool, lambda: gate.wait(5) and "done")
+        assert leader
+        with pytest.raises(FutureTimeout):
+            group.wait(call, 0.01)
+        assert not group.abandon(call)  # already running
+        gate.set()
+        assert call.future.result(timeout=5) == "done"
+    assert group.stats()["timeouts"] == 1
+
+def test_abandon_cancels_queued_call():
+    group = Group("test")
+    gate = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pool.submit(gate.wait, 5)  # occupy the only worker
+        call, _ = group.submit("k", pool, lambda: "never")
+        with pytest.raises(FutureTimeout):
+            group.wait(call, 0.01)
+        assert group.abandon(call)
+        assert call.future.cancelled()
+        assert group.stats()["in_flight"] == 0
+        gate.set()
+
+def test_disabled(monkeypatch):
+    monkeypatch.setattr(singleflight, "SINGLEFLIGHT", False)
+    group = Group("test")
+    group.claim("k")
+    _, leader = group.claim("k")
+    assert leader
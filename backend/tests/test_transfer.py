@@ -0,0 +1,54 @@
+import json
+
+import transfer
+
+def test_import_skips_malformed_rows(db):
+    lines = [
+        json.dumps({"type": "mood", "val": 4, "note": "ok", "date": "2024-03-01T09:00:00"}),
+        json.dumps({"type": "mood", "val": 2, "note": "", "date": "not a date"}),
+        json.dumps({"type": "journal", "text": "bad month", "date": "2024-13-45"}),
+        json.dumps({"type": "journal", "text": "fine", "date": "2024-03-02T10:30:00.123456"}),
+        json.dumps({"type": "mood", "val": "x", "date": "2024-03-03"}),
+        json.dumps({"type": "mood", "val": 3}),
+        "{not json",
+        json.dumps({"type": "sleep", "date": "2024-03-04"}),
+    ]
+    stats = transfer.import_lines(lines, chunk_rows=2)
+    assert stats == {"read": 8, "moods_added": 1, "journals_added": 1, "skipped": 0, "invalid": 6}
+    assert [i["date"] for i in db.get_history()] == ["2024-03-02T10:30:00.123456", "2024-03-01T09:00:00"]
+
+def seed(db):
+    db.save_batch(
+        [(3, "meh", "2024-01-01T08:00:00"), (5, "", "2024-01-02T08:00:00"), (1, "", "2024-01-02T08:00:00")],
+        [("first entry ✨", "2024-01-01T20:00:00"), ("second\nline", "2024-01-03T20:00:00")],
+    )
+
+def exported(chunk_rows=2, compress=False):
+    data = b"".join(transfer.export_chunks(chunk_rows=chunk_rows, compress=compress))
+    decoder = transfer.LineDecoder(compress)
+    # feed in small pieces to cross line and multi-byte boundaries
+    lines = [line for i in range(0, len(data), 7) for line in decoder.feed(data[i:i + 7])]
+    return lines + decoder.finish()
+
+def rows(db):
+    return [{k: v for k, v in item.items() if k != "id"} for item in transfer.export_rows()]
+
+def test_export_import_round_trip(db, tmp_path, monkeypatch):
+    seed(db)
+    before = rows(db)
+    for compress in (False, True):
+        lines = exported(compress=compress)
+        assert len(lines) == 5
+
+        monkeypatch.setattr(db, "DB_NAME", str(tmp_path / f"copy-{compress}.db"))
+        db.init_db()
+        stats = transfer.import_lines(lines, chunk_rows=2)
+        assert stats["moods_added"] == 3 and stats["journals_added"] == 2 and stats["invalid"] == 0
+        assert rows(db) == before
+
+def test_import_is_idempotent(db):
+    seed(db)
+    lines = exported()
+    stats = transfer.import_lines(lines)
+    assert stats == {"read": 5, "moods_added": 0, "journals_added": 0, "skipped": 5, "invalid": 0}
+    assert len(rows(db)) == 5
@@ -0,0 +1,80 @@
+import sqlite3
+import time
+
+import pytest
+
+import metrics
+import write_behind
+
+@pytest.fixture
+def writer(db, monkeypatch):
+    monkeypatch.setattr(write_behind.time, "sleep", lambda secs: None)
+    monkeypatch.setattr(write_behind, "FLUSH_INTERVAL_SECS", 0.01)
+    yield write_behind
+    write_behind.stop()
+
+def stat(name):
+    return write_behind.stats()[name]
+
+def wait_for(check, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not check():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_flush_retries_then_saves(writer, db, monkeypatch):
+    calls = []
+    real = db.save_batch
+
+    def flaky(moods, journals):
+        calls.append(len(moods) + len(journals))
+        if len(calls) < 3:
+            raise sqlite3.OperationalError("database is locked")
+        real(moods, journals)
+
+    monkeypatch.setattr(db, "save_batch", flaky)
+    flushed = stat("flushed")
+    writer._flush([("mood", (3, "", "2024-01-01T00:00:00")), ("journal", ("hi", "2024-01-01T00:00:01"))])
+    assert calls == [2, 2, 2]
+    assert stat("flushed") == flushed + 2
+    assert len(db.get_history()) == 2
+
+def test_bad_row_is_dropped_alone_and_counted(writer, db, monkeypatch):
+    real = db.save_batch
+
+    def reject_bad(moods, journals):
+        if any(entry == "bad" for entry, _ in journals):
+            raise ValueError("cannot store this row")
+        real(moods, journals)
+
+    monkeypatch.setattr(db, "save_batch", reject_bad)
+    failed = stat("failed")
+    writer._flush([
+        ("mood", (4, "", "2024-01-02T00:00:00")),
+        ("journal", ("bad", "2024-01-02T00:00:01")),
+        ("journal", ("good", "2024-01-02T00:00:02")),
+    ])
+    assert stat("failed") == failed + 1
+    assert sorted(i.get("text") or str(i["val"]) for i in db.get_history()) == ["4", "good"]
+    assert 'mhc_write_behind_dropped_total{kind="journal"}' in metrics.render()
+
+def test_writer_survives_unexpected_errors(writer, db, monkeypatch):
+    real = db.save_batch
+    broken = {"on": True}
+
+    def save(moods, journals):
+        if broken["on"]:
+            raise RuntimeError("not a sqlite error")
+        real(moods, journals)
+
+    monkeypatch.setattr(db, "save_batch", save)
+    failed = stat("failed")
+    writer.start()
+    writer.enqueue_mood(2, "lost")
+    wait_for(lambda: stat("failed") == failed + 1)
+    assert writer.is_running()
+
+    broken["on"] = False
+    writer.enqueue_journal("kept")
+    wait_for(lambda: any(i.get("text") == "kept" for i in db.get_history()))
+    assert writer.is_running()
@@ -1,86 +1,183 @@
-import random
+import argparse
+import hashlib
 import json
+import os
 import pickle
+import random
 import numpy as np
 import nltk
 from nltk.stem import WordNetLemmatizer
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Dense, Activation, Dropout
-from tensorflow.keras.optimizers import SGD
+
+# Trains the chatbot model on KB.json + wellness_module.json.
+# Tokenized/lemmatized patterns are cached in models/train_cache.pkl keyed by
+# each source file's hash, so an unchanged KB skips NLTK entirely, and with
+# --incremental only the intents that changed get re-tokenized.
+
+SOURCES = ['models/KB.json', 'models/wellness_module.json']
+CACHE_PATH = 'models/train_cache.pkl'
+CACHE_VERSION = 1
+SEED = 42
+ignore_letters = ['?', '!', '.', ',']
 
 # Initialize
 lemmatizer = WordNetLemmatizer()
-intents = json.loads(open('models/KB.json').read())
 
-words = []
-classes = []
-documents = []
-ignore_letters = ['?', '!', '.', ',']
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def intent_hash(intent):
+    payload = json.dumps([intent['tag'], intent.get('patterns', [])], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def tokenize_pattern(pattern):
+    return [lemmatizer.lemmatize(word.lower()) for word in nltk.word_tokenize(pattern) if word not in ignore_letters]
+
+def load_cache(use_cache):
+    if not use_cache or not os.path.exists(CACHE_PATH):
+        return {}
+    try:
+        with open(CACHE_PATH, 'rb') as f:
+            cache = pickle.load(f)
+        return cache.get('sources', {}) if cache.get('version') == CACHE_VERSION else {}
+    except Exception as e:
+        print(f"Ignoring unreadable cache: {e}")
+        return {}
+
+def load_documents(incremental=False, use_cache=True):
+    """Return [(tokens, tag), ...] for every pattern, reusing cached tokenization where possible."""
+    cached = load_cache(use_cache)
+    sources = {}
+    documents = []
+    stats = {'files_cached': 0, 'intents_cached': 0, 'intents_tokenized': 0}
+
+    for path in SOURCES:
+        digest = file_hash(path)
+        entry = cached.get(path)
+        if entry and entry['hash'] == digest:
+            # Whole file unchanged
+            sources[path] = entry
+            stats['files_cached'] += 1
+            stats['intents_cached'] += len(entry['intents'])
+        else:
+            with open(path, encoding='utf-8') as f:
+                intents = json.load(f)['intents']
+            previous = {i['key']: i for i in entry['intents']} if (entry and incremental) else {}
+            compiled = []
+            for intent in intents:
+                key = intent_hash(intent)
+                if key in previous:
+                    compiled.append(previous[key])
+                    stats['intents_cached'] += 1
+                else:
+                    compiled.append({
+                        'key': key,
+                        'tag': intent['tag'],
+                        'docs': [tokenize_pattern(p) for p in intent.get('patterns', [])],
+                    })
+                    stats['intents_tokenized'] += 1
+            sources[path] = {'hash': digest, 'intents': compiled}
+
+        for intent in sources[path]['intents']:
+            documents.extend((tokens, intent['tag']) for tokens in intent['docs'])
+
+    if use_cache:
+        with open(CACHE_PATH, 'wb') as f:
+            pickle.dump({'version': CACHE_VERSION, 'sources': sources}, f)
+    print(f"Documents: {stats}")
+    return documents
+
+def featurize(documents):
+    """Bag-of-words matrix X, one-hot labels Y, vocabulary and classes in one shot."""
+    words = sorted({token for tokens, _ in documents for token in tokens})
+    classes = sorted({tag for _, tag in documents})
+    word_index = {word: i for i, word in enumerate(words)}
+    class_index = {tag: i for i, tag in enumerate(classes)}
+
+    rows = [row for row, (tokens, _) in enumerate(documents) for _ in tokens]
+    cols = [word_index[token] for tokens, _ in documents for token in tokens]
+    train_x = np.zeros((len(documents), len(words)), dtype=np.float32)
+    train_x[rows, cols] = 1
+    train_y = np.eye(len(classes), dtype=np.float32)[[class_index[tag] for _, tag in documents]]
+    return train_x, train_y, words, classes
+
+def set_seed(seed):
+    # words/classes are sorted, so string hashing doesn't affect the data. For
+    # fully repeatable runs also fix it at launch (it can't change once the
+    # interpreter is running): PYTHONHASHSEED=42 python train.py
+    random.seed(seed)
+    np.random.seed(seed)
+
+def build_model(input_dim, output_dim):
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Dense, Dropout
+    from tensorflow.keras.optimizers import SGD
+
+    # Build Model (Enhanced for better accuracy)
+    model = Sequential()
+    model.add(Dense(128, input_shape=(input_dim,), activation='relu'))
+    model.add(Dropout(0.5))
+    model.add(Dense(64, activation='relu'))
+    model.add(Dropout(0.5))
+    model.add(Dense(output_dim, activation='softmax'))
+
+    # Compile
+    sgd = SGD(learning_rate=0.01, momentum=0.9, nesterov=True)
+    model.compile(loss='categorical_crossentropy', optimizer=sgd, metrics=['accuracy'])
+    return model
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the chatbot model on KB + Wellness intents")
+    parser.add_argument('--incremental', action='store_true', help="only re-tokenize intents that changed")
+    parser.add_argument('--no-cache', action='store_true', help="ignore and don't write the tokenization cache")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--epochs', type=int, default=200)
+    parser.add_argument('--featurize-only', action='store_true', help="build words/classes and the matrices, skip training")
+    args = parser.parse_args(argv)
+
+    # Download required NLTK data
+    nltk.download('punkt', quiet=True)
+    nltk.download('punkt_tab', quiet=True)
+    nltk.download('wordnet', quiet=True)
+
+    set_seed(args.seed)
+
+    # Process Data
+    print("Processing data...")
+    documents = load_documents(incremental=args.incremental, use_cache=not args.no_cache)
+    train_x, train_y, words, classes = featurize(documents)
+
+    print(f"Len Documents: {len(documents)}")
+    print(f"Len Classes: {len(classes)}")
+    print(f"Len Unique Words: {len(words)}")
+
+    if args.featurize_only:
+        return
+
+    pickle.dump(words, open('models/words.pkl', 'wb'))
+    pickle.dump(classes, open('models/classes.pkl', 'wb'))
+
+    # Deterministic shuffle
+    order = np.random.default_rng(args.seed).permutation(len(train_x))
+    train_x, train_y = train_x[order], train_y[order]
+
+    import tensorflow as tf
+    tf.keras.utils.set_random_seed(args.seed)
+
+    print("Building model...")
+    model = build_model(train_x.shape[1], train_y.shape[1])
+
+    # Train
+    print("Training model...")
+    model.fit(train_x, train_y, epochs=args.epochs, batch_size=5, verbose=1, shuffle=True)
+
+    # Save
+    model.save('models/chatbot_model.h5')
+    print("Model created and saved to models/chatbot_model.h5")
+
+    # Refresh the TensorFlow-free copy used for serving
+    import numpy_model
+    numpy_model.main(["chatbot"])
 
-# Download required NLTK data
-nltk.download('punkt', quiet=True)
-nltk.download('wordnet', quiet=True)
-
-# Process Data
-print("Processing data...")
-for intent in intents['intents']:
-    for pattern in intent['patterns']:
-        word_list = nltk.word_tokenize(pattern)
-        words.extend(word_list)
-        documents.append((word_list, intent['tag']))
-        if intent['tag'] not in classes:
-            classes.append(intent['tag'])
-
-words = [lemmatizer.lemmatize(word.lower()) for word in words if word not in ignore_letters]
-words = sorted(set(words))
-classes = sorted(set(classes))
-
-print(f"Len Documents: {len(documents)}")
-print(f"Len Classes: {len(classes)}")
-print(f"Len Unique Words: {len(words)}")
-
-pickle.dump(words, open('models/words.pkl', 'wb'))
-pickle.dump(classes, open('models/classes.pkl', 'wb'))
-
-# Prepare Training Data
-training = []
-output_empty = [0] * len(classes)
-
-for document in documents:
-    bag = []
-    word_patterns = document[0]
-    word_patterns = [lemmatizer.lemmatize(word.lower()) for word in word_patterns]
-    
-    for word in words:
-        bag.append(1) if word in word_patterns else bag.append(0)
-        
-    output_row = list(output_empty)
-    output_row[classes.index(document[1])] = 1
-    training.append([bag, output_row])
-
-random.shuffle(training)
-training = np.array(training, dtype=object)
-
-train_x = list(training[:, 0])
-train_y = list(training[:, 1])
-
-# Build Model (Enhanced for better accuracy)
-print("Building model...")
-model = Sequential()
-model.add(Dense(128, input_shape=(len(train_x[0]),), activation='relu'))
-model.add(Dropout(0.5))
-model.add(Dense(64, activation='relu'))
-model.add(Dropout(0.5))
-model.add(Dense(len(train_y[0]), activation='softmax'))
-
-# Compile
-sgd = SGD(learning_rate=0.01, momentum=0.9, nesterov=True)
-model.compile(loss='categorical_crossentropy', optimizer=sgd, metrics=['accuracy'])
-
-# Train
-print("Training model...")
-hist = model.fit(np.array(train_x), np.array(train_y), epochs=200, batch_size=5, verbose=1)
-
-# Save
-model.save('models/chatbot_model.h5')
-print("Model created and saved to models/chatbot_model.h5")
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+import argparse
+import codecs
+import contextlib
+import datetime
+import gzip
+import json
+import sys
+import zlib
+
+import database
+
+# Bulk export/import of moods and journals as NDJSON (one history item per line,
+# same shape as /history). Everything streams in fixed-size chunks, so memory
+# stays flat no matter how big the tables are.
+
+CHUNK_ROWS = 1000
+
+EXPORT_SQL = {
+    "mood": "SELECT id, mood_value, note, timestamp FROM moods ORDER BY id",
+    "journal": "SELECT id, entry, timestamp FROM journals ORDER BY id",
+}
+
+def export_rows(type: str = "all", chunk_rows: int = CHUNK_ROWS):
+    """Yield history-shaped dicts for every row, read chunk by chunk from a cursor."""
+    kinds = database.HISTORY_TYPES if type == "all" else (type,)
+    if any(kind not in database.HISTORY_TYPES for kind in kinds):
+        raise ValueError(f"Invalid export type: {type!r}")
+    # private connection: a streaming response may resume on a different thread
+    conn = database.open_connection()
+    try:
+        for kind in kinds:
+            cur = conn.execute(EXPORT_SQL[kind])
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                for row in rows:
+                    if kind == "mood":
+                        yield {"type": "mood", "id": row["id"], "val": row["mood_value"], "note": row["note"], "date": row["timestamp"]}
+                    else:
+                        yield {"type": "journal", "id": row["id"], "text": row["entry"], "date": row["timestamp"]}
+    finally:
+        conn.close()
+
+def export_chunks(type: str = "all", compress: bool = False, chunk_rows: int = CHUNK_ROWS):
+    """Yield NDJSON bytes (gzip-framed if compress) in blocks of chunk_rows lines."""
+    gz = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+    lines = []
+    for item in export_rows(type, chunk_rows):
+        lines.append(json.dumps(item, ensure_ascii=False))
+        if len(lines) >= chunk_rows:
+            data = ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+            data = gz.compress(data) if gz else data
+            if data:
+                yield data
+    data = ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+    if gz:
+        data = gz.compress(data) + gz.flush()
+    if data:
+        yield data
+
+class LineDecoder:
+    """Turns arbitrary byte chunks (optionally gzip) into complete text lines."""
+
+    def __init__(self, compressed: bool = False):
+        self._gz = zlib.decompressobj(16 + zlib.MAX_WBITS) if compressed else None
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._pending = ""
+
+    def feed(self, chunk: bytes):
+        if self._gz:
+            chunk = self._gz.decompress(chunk)
+        self._pending += self._text.decode(chunk)
+        *lines, self._pending = self._pending.split("\n")
+        return lines
+
+    def finish(self):
+        tail = self._gz.flush() if self._gz else b""
+        self._pending += self._text.decode(tail, final=True)
+        lines = [self._pending] if self._pending else []
+        self._pending = ""
+        return lines
+
+def parse_timestamp(value) -> str:
+    """The timestamp as stored, if it is an ISO date/time (what the app writes); ValueError otherwise."""
+    value = str(value)
+    datetime.datetime.fromisoformat(value)
+    return value
+
+class ImportBuffer:
+    """Collects parsed NDJSON lines and writes them in idempotent chunks."""
+
+    def __init__(self, chunk_rows: int = CHUNK_ROWS):
+        self.chunk_rows = chunk_rows
+        self.moods = []
+        self.journals = []
+        self.stats = {"read": 0, "moods_added": 0, "journals_added": 0, "skipped": 0, "invalid": 0}
+
+    def add(self, line: str) -> bool:
+        """Queue one line; returns True once a chunk is ready to flush()."""
+        line = line.strip()
+        if not line:
+            return False
+        self.stats["read"] += 1
+        try:
+            item = json.loads(line)
+            if item["type"] == "mood":
+                self.moods.append((int(item["val"]), item.get("note") or "", parse_timestamp(item["date"])))
+            elif item["type"] == "journal":
+                self.journals.append((str(item["text"]), parse_timestamp(item["date"])))
+            else:
+                raise ValueError(item["type"])
+        except (ValueError, KeyError, TypeError):
+            self.stats["invalid"] += 1
+        return len(self.moods) + len(self.journals) >= self.chunk_rows
+
+    def flush(self):
+        if not self.moods and not self.journals:
+            return
+        pending = len(self.moods) + len(self.journals)
+        added_moods, added_journals = database.import_batch(self.moods, self.journals)
+        self.stats["moods_added"] += added_moods
+        self.stats["journals_added"] += added_journals
+        self.stats["skipped"] += pending - added_moods - added_journals
+        self.moods = []
+        self.journals = []
+
+def import_lines(lines, chunk_rows: int = CHUNK_ROWS):
+    buf = ImportBuffer(chunk_rows)
+    for line in lines:
+        if buf.add(line):
+            buf.flush()
+    buf.flush()
+    return buf.stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export/import moods and journals as NDJSON.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    exp = sub.add_parser("export", help="write all rows as NDJSON")
+    exp.add_argument("-o", "--output", help="output file (.gz is compressed), default stdout")
+    exp.add_argument("--type", default="all", choices=["all", "mood", "journal"])
+
+    imp = sub.add_parser("import", help="load rows from NDJSON, skipping ones already present")
+    imp.add_argument("input", help="input file (.gz is decompressed), - for stdin")
+
+    parser.add_argument("--db", help="database file (default: database.DB_NAME)")
+    parser.add_argument("--chunk", type=int, default=CHUNK_ROWS, help="rows per read/insert chunk")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        database.DB_NAME = args.db
+    with contextlib.redirect_stdout(sys.stderr):  # keep stdout clean for NDJSON
+        database.init_db()
+
+    if args.command == "export":
+        if args.output:
+            opener = gzip.open if args.output.endswith(".gz") else open
+            with opener(args.output, "wb") as f:
+                for data in export_chunks(args.type, chunk_rows=args.chunk):
+                    f.write(data)
+        else:
+            for data in export_chunks(args.type, chunk_rows=args.chunk):
+                sys.stdout.buffer.write(data)
+    else:
+        if args.input == "-":
+            stats = import_lines(sys.stdin, args.chunk)
+        else:
+            opener = gzip.open if args.input.endswith(".gz") else open
+            with opener(args.input, "rt", encoding="utf-8") as f:
+                stats = import_lines(f, args.chunk)
+        print(json.dumps(stats), file=sys.stderr)
+
+    database.close_all()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import os
+import queue
+import threading
+import time
+
+import database
+import metrics
+
+# Optional write-behind mode for /mood and /journal.
+# Requests only enqueue the row; a background thread commits queued rows in
+# batches (by size or time), so a burst of check-ins costs one fsync per batch.
+
+ENABLED = os.getenv("WRITE_BEHIND", "0") == "1"
+QUEUE_SIZE = int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "1000"))
+BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "100"))
+FLUSH_INTERVAL_SECS = float(os.getenv("WRITE_BEHIND_FLUSH_SECS", "0.5"))
+# How long a request waits for room in a full queue before giving up
+ENQUEUE_TIMEOUT_SECS = float(os.getenv("WRITE_BEHIND_ENQUEUE_TIMEOUT_SECS", "2"))
+FLUSH_RETRIES = 3
+
+class QueueFull(Exception):
+    """The write-behind queue stayed full for ENQUEUE_TIMEOUT_SECS."""
+
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_thread = None
+_stopping = threading.Event()
+_stats = {"enqueued": 0, "flushed": 0, "batches": 0, "failed": 0}
+_stats_lock = threading.Lock()
+
+def is_running() -> bool:
+    return _thread is not None and _thread.is_alive()
+
+def start():
+    global _thread
+    if is_running():
+        return
+    _stopping.clear()
+    _thread = threading.Thread(target=_run, name="write-behind", daemon=True)
+    _thread.start()
+    print(f"Write-behind enabled (batch {BATCH_SIZE}, every {FLUSH_INTERVAL_SECS}s, queue {QUEUE_SIZE}).")
+
+def stop(timeout: float = 10.0):
+    """Flush everything still queued and stop the writer thread."""
+    global _thread
+    if not is_running():
+        return
+    _stopping.set()
+    try:
+        _queue.put_nowait(None)  # wake the writer up
+    except queue.Full:
+        pass
+    _thread.join(timeout)
+    _thread = None
+
+def _enqueue(item):
+    try:
+        _queue.put(item, timeout=ENQUEUE_TIMEOUT_SECS)
+    except queue.Full:
+        raise QueueFull("write-behind queue is full")
+    with _stats_lock:
+        _stats["enqueued"] += 1
+
+def enqueue_mood(mood: int, note: str):
+    _enqueue(("mood", (mood, note, database.now_ts())))
+
+def enqueue_journal(entry: str):
+    _enqueue(("journal", (entry, database.now_ts())))
+
+def _save(batch):
+    database.save_batch(
+        [row for kind, row in batch if kind == "mood"],
+        [row for kind, row in batch if kind == "journal"],
+    )
+
+def _flush(batch):
+    for attempt in range(FLUSH_RETRIES):
+        try:
+            _save(batch)
+            with _stats_lock:
+                _stats["flushed"] += len(batch)
+                _stats["batches"] += 1
+            return
+        except Exception as e:
+            print(f"Write-behind flush failed (attempt {attempt + 1}): {e!r}")
+            time.sleep(0.1 * (attempt + 1))
+    # these rows were already answered 202 "queued": save what can be saved
+    # one by one, so a single bad row doesn't take the batch with it
+    dropped = []
+    for item in batch:
+        try:
+            _save([item])
+        except Exception as e:
+            dropped.append((item, e))
+            continue
+        with _stats_lock:
+            _stats["flushed"] += 1
+    with _stats_lock:
+        _stats["batches"] += 1
+        _stats["failed"] += len(dropped)
+    for (kind, row), e in dropped:
+        # the text stays out of the log, the timestamp identifies the row
+        print(f"Write-behind dropped a {kind} from {row[-1]}: {e!r}")
+        metrics.inc("mhc_write_behind_dropped_total", help="Queued rows the write-behind writer gave up on", kind=kind)
+
+def _run():
+    while True:
+        try:
+            first = _queue.get(timeout=FLUSH_INTERVAL_SECS)
+        except queue.Empty:
+            if _stopping.is_set():
+                break
+            continue
+
+        batch = [first] if first is not None else []
+        deadline = time.monotonic() + FLUSH_INTERVAL_SECS
+        while len(batch) < BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 and not _stopping.is_set():
+                break
+            try:
+                item = _queue.get(timeout=max(remaining, 0)) if not _stopping.is_set() else _queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                batch.append(item)
+
+        if batch:
+            try:
+                _flush(batch)
+            except Exception as e:
+                # never let the writer die: later enqueues would only pile up
+                print(f"Write-behind writer error: {e!r}")
+        if _stopping.is_set() and _queue.empty():
+            break
+
+def stats():
+    with _stats_lock:
+        return dict(_stats, queued=_queue.qsize(), running=is_running())
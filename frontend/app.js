@@ -28,27 +28,30 @@ const ctx = overlay ? overlay.getContext("2d") : null;
 const historyList = document.getElementById("history-list");
 const loadHistoryBtn = document.getElementById("load-history-btn");
 
-let chatHistory = [];
+// The server keeps the conversation; we only send its id with each new message
+let chatSessionId = sessionStorage.getItem("chatSessionId");
 let currentDetectedMood = "neutral";
 let currentFilter = "all"; // all, mood, journal
 
 // --- CHAT LOGIC ---
 
-function appendMessage(role, text) {
-    const div = document.createElement("div");
-    div.className = `chat-msg ${role === "user" ? "user-msg" : "bot-msg"}`;
-
+function formatMessage(text) {
     // Basic markdown-ish parsing for bold and resources
-    let formattedText = text
+    return text
         .replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>')
         .replace(/📺 (.*?)\n/g, '<div class="resource-block">📺 $1</div>')
         .replace(/\n/g, '<br>');
+}
+
+function appendMessage(role, text) {
+    const div = document.createElement("div");
+    div.className = `chat-msg ${role === "user" ? "user-msg" : "bot-msg"}`;
 
     // Bubble structure
     div.innerHTML = `
         <div class="msg-bubble">
             <span class="role-label">${role === "user" ? "You" : "Companion"}</span>
-            <div class="msg-text">${formattedText}</div>
+            <div class="msg-text">${formatMessage(text)}</div>
         </div>
     `;
 
@@ -59,6 +62,12 @@ function appendMessage(role, text) {
         top: chatLog.scrollHeight,
         behavior: 'smooth'
     });
+    return div;
+}
+
+function updateMessage(div, text) {
+    div.querySelector(".msg-text").innerHTML = formatMessage(text);
+    chatLog.scrollTop = chatLog.scrollHeight;
 }
 
 function showTypingIndicator() {
@@ -81,44 +90,107 @@ function hideTypingIndicator() {
     if (el) el.remove();
 }
 
+async function restoreChat() {
+    try {
+        const res = await fetch(`${API_BASE_URL}/sessions/${encodeURIComponent(chatSessionId)}`);
+        if (!res.ok) {
+            // expired or deleted, the next message starts a new session
+            chatSessionId = null;
+            sessionStorage.removeItem("chatSessionId");
+            return;
+        }
+        const data = await res.json();
+        data.turns.forEach(turn => appendMessage(turn.role, turn.content));
+    } catch (err) {
+        console.error("Could not restore chat:", err);
+    }
+}
+
 async function sendChat() {
     const message = chatInput.value.trim();
     if (!message) return;
 
     appendMessage("user", message);
-    chatHistory.push({ role: "user", content: message });
     chatInput.value = "";
 
     showTypingIndicator();
 
     try {
-        const res = await fetch(`${API_BASE_URL}/chat`, {
+        // Tokens are rendered as they arrive (Server-Sent Events over a POST body)
+        const res = await fetch(`${API_BASE_URL}/chat/stream`, {
             method: "POST",
             headers: { "Content-Type": "application/json" },
             body: JSON.stringify({
                 message: message,
-                history: chatHistory,
+                session_id: chatSessionId,
                 mood: currentDetectedMood
             }),
         });
 
+        if (res.status === 429) {
+            // chat is saturated and the server is set to turn turns away (CHAT_OVERLOAD=reject)
+            hideTypingIndicator();
+            const wait = res.headers.get("Retry-After") || "a few";
+            appendMessage("bot", `I'm getting a lot of messages right now. Please try again in ${wait} seconds.`);
+            return;
+        }
         if (!res.ok) throw new Error(`Server error: ${res.status}`);
 
-        const data = await res.json();
-
-        // Add a slight delay for realism
-        setTimeout(() => {
-            hideTypingIndicator();
-            appendMessage("bot", data.reply);
-            chatHistory.push({ role: "bot", content: data.reply });
-
-            if (data.crisis) {
-                const crisisDiv = document.createElement("div");
-                crisisDiv.className = "crisis-alert";
-                crisisDiv.innerHTML = "<strong>Safety Alert:</strong> If you're in immediate danger, please call emergency services (911/112).";
-                chatLog.appendChild(crisisDiv);
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        let reply = "";
+        let botDiv = null;
+        let crisis = false;
+
+        const handleEvent = (raw) => {
+            let event = "message";
+            let data = "";
+            raw.split("\n").forEach(line => {
+                if (line.startsWith("event:")) event = line.slice(6).trim();
+                if (line.startsWith("data:")) data += line.slice(5).trim();
+            });
+            if (!data) return;
+            const payload = JSON.parse(data);
+
+            if (event === "done") {
+                crisis = payload.crisis;
+                if (payload.session_id) {
+                    chatSessionId = payload.session_id;
+                    sessionStorage.setItem("chatSessionId", chatSessionId);
+                }
+                return;
+            }
+            // "replace" = upstream failed mid-reply, server sent the local fallback instead
+            reply = event === "replace" ? payload.text : reply + payload.text;
+            if (!botDiv) {
+                hideTypingIndicator();
+                botDiv = appendMessage("bot", reply);
+            } else {
+                updateMessage(botDiv, reply);
+            }
+        };
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let sep;
+            while ((sep = buffer.indexOf("\n\n")) !== -1) {
+                handleEvent(buffer.slice(0, sep));
+                buffer = buffer.slice(sep + 2);
             }
-        }, 600);
+        }
+
+        hideTypingIndicator();
+        if (!botDiv) throw new Error("Empty reply");
+
+        if (crisis) {
+            const crisisDiv = document.createElement("div");
+            crisisDiv.className = "crisis-alert";
+            crisisDiv.innerHTML = "<strong>Safety Alert:</strong> If you're in immediate danger, please call emergency services (911/112).";
+            chatLog.appendChild(crisisDiv);
+        }
 
     } catch (err) {
         hideTypingIndicator();
@@ -153,12 +225,13 @@ if (moodButtons.length > 0 && logMoodBtn) {
         }
         moodStatus.textContent = "Saving...";
         try {
-            await fetch(`${API_BASE_URL}/mood`, {
+            const res = await fetch(`${API_BASE_URL}/mood`, {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
                 body: JSON.stringify({ mood: selectedMood, note: moodNoteInput.value.trim() }),
             });
-            moodStatus.textContent = "Saved to your history!";
+            // 202: queued by the server, shows up in history shortly
+            moodStatus.textContent = res.status === 202 ? "Saved! It will show in your history shortly." : "Saved to your history!";
             moodNoteInput.value = "";
 
             // Refresh history if we are on the history page or it exists
@@ -177,12 +250,12 @@ if (saveJournalBtn && journalInput) {
         if (!entry) return;
         journalStatus.textContent = "Saving...";
         try {
-            await fetch(`${API_BASE_URL}/journal`, {
+            const res = await fetch(`${API_BASE_URL}/journal`, {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
                 body: JSON.stringify({ entry }),
             });
-            journalStatus.textContent = "Journal entry saved.";
+            journalStatus.textContent = res.status === 202 ? "Journal entry saved, it will show in your history shortly." : "Journal entry saved.";
             journalInput.value = "";
 
             // Refresh history if it exists
@@ -194,53 +267,76 @@ if (saveJournalBtn && journalInput) {
 }
 
 // --- HISTORY ---
-async function loadHistory() {
+const HISTORY_PAGE_SIZE = 50;
+
+function renderHistoryItem(item) {
+    const div = document.createElement("div");
+    div.className = "history-item card";
+    const date = new Date(item.date).toLocaleString();
+
+    if (item.type === "mood") {
+        div.innerHTML = `
+            <div style="border-left: 4px solid var(--primary); padding-left: 15px;">
+                <span class="role-label" style="color: var(--primary)">Mood Log</span>
+                <div style="font-size: 1.2rem; font-weight: 700;">Rating: ${item.val}/5</div>
+                ${item.note ? `<p style="margin-top: 5px; font-style: italic;">"${item.note}"</p>` : ""}
+                <small class="muted">${date}</small>
+            </div>
+        `;
+    } else {
+        div.innerHTML = `
+            <div style="border-left: 4px solid var(--secondary); padding-left: 15px;">
+                <span class="role-label" style="color: var(--secondary)">Journal Entry</span>
+                <p style="margin: 10px 0; font-size: 1.05rem;">${item.text}</p>
+                <small class="muted">${date}</small>
+            </div>
+        `;
+    }
+    historyList.appendChild(div);
+}
+
+// before = cursor from the previous page's X-Next-Cursor header (appends instead of replacing)
+// ETag of the first history page on screen; an unchanged page isn't rendered again
+let historyEtag = null;
+
+async function loadHistory(before = null) {
     if (!historyList) return;
-    historyList.innerHTML = "Loading journey...";
+    if (!before && !historyEtag) historyList.innerHTML = "Loading journey...";
 
     try {
-        const res = await fetch(`${API_BASE_URL}/history`);
+        // Filtering and paging happen on the server
+        const params = new URLSearchParams({ type: currentFilter, limit: HISTORY_PAGE_SIZE });
+        if (before) params.set("before", before);
+        // The browser revalidates its cached copy (If-None-Match); the server answers 304 when nothing changed
+        const res = await fetch(`${API_BASE_URL}/history?${params}`);
+        const etag = res.headers.get("ETag");
+        if (!before && etag && etag === historyEtag) return;
         const data = await res.json();
+        const nextCursor = res.headers.get("X-Next-Cursor");
+        if (!before) historyEtag = etag;
 
-        historyList.innerHTML = "";
-
-        // Filter the data based on current selection
-        const filteredData = currentFilter === "all"
-            ? data
-            : data.filter(item => item.type === currentFilter);
+        const moreBtn = document.getElementById("history-more-btn");
+        if (moreBtn) moreBtn.remove();
+        if (!before) historyList.innerHTML = "";
 
-        if (filteredData.length === 0) {
+        if (!before && data.length === 0) {
             const typeLabel = currentFilter === "all" ? "entries" : (currentFilter === "mood" ? "mood logs" : "journal entries");
             historyList.innerHTML = `<p class='muted'>No ${typeLabel} found. Start logging to see your journey.</p>`;
             return;
         }
 
-        filteredData.forEach(item => {
-            const div = document.createElement("div");
-            div.className = "history-item card";
-            const date = new Date(item.date).toLocaleString();
-
-            if (item.type === "mood") {
-                div.innerHTML = `
-                    <div style="border-left: 4px solid var(--primary); padding-left: 15px;">
-                        <span class="role-label" style="color: var(--primary)">Mood Log</span>
-                        <div style="font-size: 1.2rem; font-weight: 700;">Rating: ${item.val}/5</div>
-                        ${item.note ? `<p style="margin-top: 5px; font-style: italic;">"${item.note}"</p>` : ""}
-                        <small class="muted">${date}</small>
-                    </div>
-                `;
-            } else {
-                div.innerHTML = `
-                    <div style="border-left: 4px solid var(--secondary); padding-left: 15px;">
-                        <span class="role-label" style="color: var(--secondary)">Journal Entry</span>
-                        <p style="margin: 10px 0; font-size: 1.05rem;">${item.text}</p>
-                        <small class="muted">${date}</small>
-                    </div>
-                `;
-            }
-            historyList.appendChild(div);
-        });
+        data.forEach(renderHistoryItem);
+
+        if (nextCursor) {
+            const btn = document.createElement("button");
+            btn.id = "history-more-btn";
+            btn.className = "secondary-btn";
+            btn.textContent = "Load more";
+            btn.addEventListener("click", () => loadHistory(nextCursor));
+            historyList.appendChild(btn);
+        }
     } catch (err) {
+        historyEtag = null;
         historyList.innerHTML = `<p style="color: #ef4444;">Error loading history: ${err.message}</p>`;
     }
 }
@@ -371,4 +467,9 @@ function updateThemeUI(isDark) {
     if (historyList) {
         loadHistory();
     }
+
+    // 3. Redraw the conversation after a reload
+    if (chatLog && chatSessionId) {
+        restoreChat();
+    }
 })();